@@ -2,7 +2,7 @@
 
 {
     'name': 'Exam Management',
-    'version': "13.0.1.0.0",
+    'version': "13.0.1.1.0",
     'author': 'Serpent Consulting Services Pvt. Ltd.',
     'website': 'http://www.serpentcs.com',
     'category': 'School Management',
@@ -15,13 +15,17 @@
              'security/ir.model.access.csv',
              'views/exam_view.xml',
              'views/exam_sequence.xml',
+             'data/exam_schedular.xml',
              'views/exam_result_report.xml',
              'views/additional_exam_report.xml',
              'views/result_information_report.xml',
              'views/batch_exam.xml',
              'views/report_view.xml',
              'wizard/subject_result.xml',
-             'wizard/batch_result.xml'],
+             'wizard/batch_result.xml',
+             'wizard/marks_entry.xml',
+             'wizard/report_card.xml',
+             'wizard/move_standards.xml'],
     'demo': ['demo/exam_demo.xml'],
     'installable': True,
     'application': True,
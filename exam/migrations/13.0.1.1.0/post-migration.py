@@ -0,0 +1,15 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    '''Recompute the stored totals of the exam results, which could leak
+    from one result to the next one before.'''
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    results = env['exam.result'].with_context(active_test=False).search([])
+    for fname in ('total', 'percentage', 'grade', 'result'):
+        env.add_to_compute(results._fields[fname], results)
+    results.recompute()
@@ -1,8 +1,9 @@
 # See LICENSE file for full copyright and licensing details.
 
+import bisect
 from datetime import date, datetime
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import ValidationError, UserError
 
 
 class StudentStudent(models.Model):
@@ -67,25 +68,12 @@ class ExtendedTimeTable(models.Model):
 
     @api.constrains('exam_timetable_line_ids')
     def _check_exam(self):
-        '''Method to check same exam is not assigned on same day.'''
-        if self.timetable_type == 'exam':
-            if not self.exam_timetable_line_ids:
+        '''Method to check the exam timetable has lines, the overlaps
+        being checked by the exam conflict engine of the lines.'''
+        for rec in self:
+            if (rec.timetable_type == 'exam' and
+                    not rec.exam_timetable_line_ids):
                 raise ValidationError(_(''' Please Enter Exam Timetable!'''))
-            domain = [('table_id', 'in', self.ids)]
-            line_ids = self.env['time.table.line'].search(domain)
-            for rec in line_ids:
-                records = [rec_check.id for rec_check in line_ids
-                           if (rec.day_of_week == rec_check.day_of_week and
-                               rec.start_time == rec_check.start_time and
-                               rec.end_time == rec_check.end_time and
-                               rec.teacher_id.id == rec.teacher_id.id and
-                               rec.exm_date == rec.exm_date)]
-                if len(records) > 1:
-                    raise ValidationError(_('''You cannot set exam at same
-                                            time %s  at same day %s for
-                                            teacher %s!''') %
-                                           (rec.start_time, rec.day_of_week,
-                                            rec.teacher_id.name))
 
 
 class ExtendedTimeTableLine(models.Model):
@@ -132,44 +120,100 @@ for the date or you have selected invalid date!'''))
                 raise ValidationError(_('''Start time should be less than end \
 time!'''))
 
-    @api.constrains('teacher_id', 'class_room_id')
+    def _get_exam_conflict_keys(self):
+        '''Return the (kind, id) keys under which an exam line is indexed:
+        an exam line cannot overlap another exam line sharing one of them
+        on the same date.'''
+        self.ensure_one()
+        keys = []
+        if self.class_room_id:
+            keys.append(('room', self.class_room_id.id))
+        if self.teacher_id:
+            keys.append(('teacher', self.teacher_id.id))
+        if self.table_id.standard_id:
+            keys.append(('standard', self.table_id.standard_id.id))
+        return keys
+
+    def get_exam_conflicts(self):
+        '''Return every overlap of the exam lines with the other exams.
+
+        The exam lines of the same dates are read once and indexed by
+        (kind, date, room/supervisor/class), each index being sorted on
+        the start time with a running maximum of the end times, so that
+        a line is only compared with the lines which overlap it.
+        @return : list of (line, other line, kind) tuples, the kind being
+                  'room', 'teacher' or 'standard'
+        '''
+        lines = self.filtered(
+            lambda line: line.exm_date and
+            line.table_id.timetable_type == 'exam')
+        if not lines:
+            return []
+        others = self.search([('table_id.timetable_type', '=', 'exam'),
+                              ('exm_date', 'in',
+                               list(set(lines.mapped('exm_date'))))])
+        groups = {}
+        for other in others | lines:
+            for kind, key in other._get_exam_conflict_keys():
+                groups.setdefault((kind, other.exm_date, key), []).append(
+                    other)
+        index = {}
+        for group_key, group in groups.items():
+            group.sort(key=lambda other: other.start_time)
+            max_ends = []
+            for other in group:
+                max_ends.append(max(max_ends and max_ends[-1] or 0.0,
+                                    other.end_time))
+            index[group_key] = ([other.start_time for other in group],
+                                max_ends, group)
+        line_ids = set(lines.ids)
+        conflicts = []
+        for line in lines:
+            for kind, key in line._get_exam_conflict_keys():
+                starts, max_ends, group = index[(kind, line.exm_date, key)]
+                pos = bisect.bisect_left(starts, line.end_time) - 1
+                while pos >= 0 and max_ends[pos] > line.start_time:
+                    other = group[pos]
+                    pos -= 1
+                    if (other == line or other.end_time <= line.start_time or
+                            (other.id in line_ids and other.id < line.id)):
+                        continue
+                    conflicts.append((line, other, kind))
+        return conflicts
+
+    @api.constrains('teacher_id', 'class_room_id', 'week_day', 'exm_date',
+                    'start_time', 'end_time', 'table_id')
     def check_teacher_room(self):
-        """Method to Check room."""
-        timetable_rec = self.env['time.table'].search([('id', '!=',
-                                                        self.table_id.id)])
-        if timetable_rec:
-            for data in timetable_rec:
-                for record in data.timetable_ids:
-                    if (data.timetable_type == 'exam' and
-                            self.table_id.timetable_type == 'exam' and
-                            self.class_room_id == record.class_room_id and
-                            self.start_time == record.start_time):
-                            raise ValidationError(_("The room is occupied!"))
-
-    @api.constrains('subject_id', 'class_room_id')
+        """Method to check the exam room, supervisor and class are not
+        taken by an overlapping exam, reporting all the conflicts."""
+        super(ExtendedTimeTableLine, self).check_teacher_room()
+        messages = {'room': _('Room %s is occupied by %s and %s on %s!'),
+                    'teacher': _('Supervisor %s has two exams, %s and %s, '
+                                 'on %s!'),
+                    'standard': _('Class %s has two exams, %s and %s, '
+                                  'on %s!')}
+        errors = []
+        for line, other, kind in self.get_exam_conflicts():
+            name = {'room': line.class_room_id.name,
+                    'teacher': line.teacher_id.name,
+                    'standard': line.table_id.standard_id.name}[kind]
+            errors.append(messages[kind] % (
+                name, '%s/%s' % (line.table_id.name, line.subject_id.name),
+                '%s/%s' % (other.table_id.name, other.subject_id.name),
+                line.exm_date))
+        if errors:
+            raise ValidationError('\n'.join(errors))
+
+    @api.constrains('subject_id', 'table_id')
     def check_exam_date(self):
-        """Method to Check Exam Date."""
-        for rec in self.table_id.exam_timetable_line_ids:
-            record = self.table_id
-            if rec.id not in self.ids:
-                if (record.timetable_type == 'exam' and
-                        self.exm_date == rec.exm_date and
-                        self.start_time == rec.start_time):
-                    raise ValidationError(_('''There is already Exam at
-                        same Date and Time!'''))
-                if (record.timetable_type == 'exam' and
-                        self.table_id.timetable_type == 'exam' and
-                        self.subject_id == rec.subject_id):
-                        raise ValidationError(_('''%s Subject Exam Already
-                        Taken''') % (self.subject_id.name))
-                if (record.timetable_type == 'exam' and
-                        self.table_id.timetable_type == 'exam' and
-                        self.exm_date == rec.exm_date and
-                        self.class_room_id == rec.class_room_id and
-                        self.start_time == rec.start_time):
-                    raise ValidationError(_('''%s is occupied by '%s' for %s
-                    class!''') % (self.class_room_id.name, record.name,
-                                  record.standard_id.standard_id.name))
+        """Method to check a subject is examined once per timetable."""
+        for line in self.filtered(
+                lambda line: line.table_id.timetable_type == 'exam'):
+            if line.table_id.exam_timetable_line_ids.filtered(
+                    lambda rec: rec != line and
+                    rec.subject_id == line.subject_id):
+                raise ValidationError(_('''%s Subject Exam Already
+                Taken''') % (line.subject_id.name))
 
 
 class ExamExam(models.Model):
@@ -229,6 +273,12 @@ class ExamExam(models.Model):
                                     help="Select Academic Year")
     exam_schedule_ids = fields.One2many('exam.schedule.line', 'exam_id',
                                         'Exam Schedule')
+    result_generation = fields.Selection([('queued', 'Queued'),
+                                          ('done', 'Generated')],
+                                         'Result Generation', readonly=True,
+                                         copy=False,
+                                         help="State of the result generation "
+                                              "running in background")
 
     def set_to_draft(self):
         '''Method to set state to draft'''
@@ -254,49 +304,273 @@ class ExamExam(models.Model):
 
     def generate_result(self):
         '''Method to generate result'''
-        result_obj = self.env['exam.result']
-        student_obj = self.env['student.student']
-        result_list = []
-        for rec in self:
-            for exam_schedule in rec.exam_schedule_ids:
-                domain = [('standard_id', '=', exam_schedule.standard_id.id),
-                          ('year', '=', rec.academic_year.id),
-                          ('state', '=', 'done'),
-                          ('school_id', '=',
-                           exam_schedule.standard_id.school_id.id)]
-                students = student_obj.search(domain)
-                for student in students:
-                    domain = [('standard_id', '=',
-                               student.standard_id.id),
-                              ('student_id', '=', student.id),
-                              ('s_exam_ids', '=', rec.id)]
-                    result_exists = result_obj.search(domain)
-                    if result_exists:
-                        [result_list.append(res.id) for res in result_exists]
-                    else:
-                        rs_dict = {'s_exam_ids': rec.id,
-                                   'student_id': student.id,
-                                   'standard_id': student.standard_id.id,
-                                   'roll_no_id': student.roll_no,
-                                   'grade_system': rec.grade_system.id,
-                                   }
-                        exam_line = []
-                        timetable = exam_schedule.sudo().timetable_id
-                        for line in timetable.sudo().timetable_ids:
-                            min_mrks = line.subject_id.minimum_marks
-                            max_mrks = line.subject_id.maximum_marks
-                            sub_vals = {'subject_id': line.subject_id.id,
-                                        'minimum_marks': min_mrks,
-                                        'maximum_marks': max_mrks}
-                            exam_line.append((0, 0, sub_vals))
-                        rs_dict.update({'result_ids': exam_line})
-                        result = result_obj.create(rs_dict)
-                        result_list.append(result.id)
+        result_ids = self._generate_results()
         return {'name': _('Result Info'),
                 'view_mode': 'tree,form',
                 'res_model': 'exam.result',
                 'type': 'ir.actions.act_window',
-                'domain': [('id', 'in', result_list)]}
+                'domain': [('id', 'in', result_ids)]}
+
+    def generate_result_background(self):
+        '''Queue the result generation of the exams for the scheduled
+        action, so that large exams do not hold the user transaction'''
+        self.write({'result_generation': 'queued'})
+        return True
+
+    @api.model
+    def _cron_generate_results(self, auto_commit=False):
+        '''Scheduled action generating the results of the queued exams.
+
+        The results are created one exam schedule at a time and, with
+        auto_commit, committed after each of them to keep every
+        transaction short.
+        '''
+        for exam in self.search([('result_generation', '=', 'queued')]):
+            for schedule in exam.exam_schedule_ids:
+                exam._generate_results(schedule)
+                if auto_commit:
+                    self.env.cr.commit()
+            exam.result_generation = 'done'
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    def _generate_results(self, schedules=None):
+        '''Create the missing results of the exams in bulk.
+
+        The existing results, the students and the subjects of every
+        schedule are read once, and all the missing results are created
+        together with their subject lines in a single create call.
+        @param schedules : exam schedules to generate, all the schedules
+                           of the exams when not given
+        @return : ids of the results of the students of the schedules
+        '''
+        result_obj = self.env['exam.result']
+        if schedules is None:
+            schedules = self.mapped('exam_schedule_ids')
+        schedules = schedules.filtered(
+            lambda schedule: schedule.standard_id and
+            schedule.exam_id in self)
+        if not schedules:
+            return []
+        existing = {}
+        for result in result_obj.search_read(
+                [('s_exam_ids', 'in', schedules.mapped('exam_id').ids),
+                 ('standard_id', 'in', schedules.mapped('standard_id').ids)],
+                ['s_exam_ids', 'student_id', 'standard_id']):
+            key = (result['s_exam_ids'][0], result['student_id'][0],
+                   result['standard_id'][0])
+            existing.setdefault(key, []).append(result['id'])
+        students = {}
+        for student in self.env['student.student'].search_read(
+                [('standard_id', 'in', schedules.mapped('standard_id').ids),
+                 ('year', 'in', schedules.mapped('exam_id.academic_year').ids),
+                 ('state', '=', 'done')],
+                ['standard_id', 'year', 'school_id', 'roll_no']):
+            key = (student['standard_id'][0], student['year'][0],
+                   student['school_id'] and student['school_id'][0])
+            students.setdefault(key, []).append(student)
+
+        result_ids = []
+        vals_list = []
+        for schedule in schedules:
+            exam = schedule.exam_id
+            standard = schedule.standard_id
+            # Subject lines are the same for every student of the schedule.
+            timetable = schedule.sudo().timetable_id
+            exam_line = [{'subject_id': line.subject_id.id,
+                          'minimum_marks': line.subject_id.minimum_marks,
+                          'maximum_marks': line.subject_id.maximum_marks}
+                         for line in timetable.timetable_ids]
+            for student in students.get((standard.id, exam.academic_year.id,
+                                         standard.school_id.id), []):
+                key = (exam.id, student['id'], standard.id)
+                if key in existing:
+                    result_ids.extend(existing[key])
+                    continue
+                existing[key] = []
+                vals_list.append({'s_exam_ids': exam.id,
+                                  'student_id': student['id'],
+                                  'standard_id': standard.id,
+                                  'roll_no_id': student['roll_no'],
+                                  'grade_system': exam.grade_system.id,
+                                  'result_ids': [(0, 0, dict(sub_vals))
+                                                 for sub_vals in exam_line]})
+        result_ids.extend(result_obj.create(vals_list).ids)
+        return result_ids
+
+    def set_marks_matrix(self, standard_id, marks):
+        '''Enter the marks of a whole class for the exam at once.
+
+        Only the draft results are updated. All the marks are checked
+        against the maximum marks of their subject line before anything
+        is written, and the subject lines sharing the same marks are
+        written together, so that the totals and grades of each result
+        are recomputed once.
+        @param standard_id : id of the school standard
+        @param marks : dictionary mapping a student id to a dictionary
+                       mapping a subject id to the obtained marks
+        @return : recordset of the updated exam results
+        '''
+        self.ensure_one()
+        subject_obj = self.env['exam.subject']
+        lines = {}
+        for line in subject_obj.search_read(
+                [('exam_id.s_exam_ids', '=', self.id),
+                 ('exam_id.standard_id', '=', standard_id),
+                 ('exam_id.student_id', 'in', list(marks)),
+                 ('exam_id.state', '=', 'draft')],
+                ['exam_id', 'subject_id', 'maximum_marks']):
+            lines.setdefault((line['exam_id'][0], line['subject_id'] and
+                              line['subject_id'][0]), []).append(line)
+        results = {}
+        for result in self.env['exam.result'].search_read(
+                [('s_exam_ids', '=', self.id),
+                 ('standard_id', '=', standard_id),
+                 ('student_id', 'in', list(marks)),
+                 ('state', '=', 'draft')], ['student_id']):
+            results.setdefault(result['student_id'][0], []).append(
+                result['id'])
+        # Marks cannot be entered when a student has several draft
+        # results or a result several lines of the same subject.
+        duplicates = []
+        for student_id, subject_marks in marks.items():
+            result_ids = results.get(student_id, [])
+            if len(result_ids) > 1:
+                duplicates.append(_('Student %s has several draft results '
+                                    'for this exam: %s') % (
+                    student_id, ', '.join(map(str, result_ids))))
+                continue
+            for result_id in result_ids:
+                for subject_id in subject_marks:
+                    if len(lines.get((result_id, subject_id), [])) > 1:
+                        duplicates.append(_('The result %s has several '
+                                            'lines of subject %s') % (
+                            result_id, subject_id))
+        if duplicates:
+            raise UserError('\n'.join(duplicates))
+        errors = []
+        to_write = {}
+        for student_id, subject_marks in marks.items():
+            result_id = results.get(student_id, [False])[0]
+            if not result_id:
+                errors.append(_('No draft result of student %s for this '
+                                'exam!') % student_id)
+                continue
+            for subject_id, obtain_marks in subject_marks.items():
+                line = lines.get((result_id, subject_id), [False])[0]
+                if not line:
+                    errors.append(_('No subject %s in the result %s!') %
+                                  (subject_id, result_id))
+                elif not 0 <= obtain_marks <= line['maximum_marks']:
+                    errors.append(_('The marks %s of subject %s should be '
+                                    'between 0 and %s for the result %s!') %
+                                  (obtain_marks, line['subject_id'][1],
+                                   line['maximum_marks'], result_id))
+                else:
+                    to_write.setdefault(obtain_marks, []).append(line['id'])
+        if errors:
+            raise ValidationError('\n'.join(errors))
+        for obtain_marks, line_ids in to_write.items():
+            subject_obj.browse(line_ids).write({'obtain_marks': obtain_marks})
+        return self.env['exam.result'].browse(
+            [result_ids[0] for result_ids in results.values()])
+
+    def compute_result_ranks(self):
+        '''Rank the confirmed results of the exams.
+
+        The class rank, the standard-wide rank and the percentile of all
+        the results are computed by the database with window functions
+        and written with one UPDATE. Draft results and results under
+        re-evaluation are left unranked.
+        '''
+        if not self:
+            return True
+        result_obj = self.env['exam.result']
+        result_obj.flush(['s_exam_ids', 'standard_id', 'percentage', 'state',
+                          'active'])
+        self.env['school.standard'].flush(['standard_id'])
+        self._cr.execute("""
+            UPDATE exam_result
+            SET class_rank = NULL, standard_rank = NULL, percentile = NULL
+            WHERE s_exam_ids IN %s""", (tuple(self.ids),))
+        self._cr.execute("""
+            UPDATE exam_result AS res
+            SET class_rank = ranked.class_rank,
+                standard_rank = ranked.standard_rank,
+                percentile = ranked.percentile
+            FROM (
+                SELECT res.id,
+                       RANK() OVER (PARTITION BY res.s_exam_ids,
+                                                 res.standard_id
+                                    ORDER BY res.percentage DESC
+                                    ) AS class_rank,
+                       RANK() OVER (PARTITION BY res.s_exam_ids,
+                                                 std.standard_id
+                                    ORDER BY res.percentage DESC
+                                    ) AS standard_rank,
+                       100 * CUME_DIST() OVER (PARTITION BY res.s_exam_ids,
+                                                            std.standard_id
+                                               ORDER BY res.percentage
+                                               ) AS percentile
+                FROM exam_result res
+                LEFT JOIN school_standard std ON std.id = res.standard_id
+                WHERE res.s_exam_ids IN %s
+                  AND res.state NOT IN ('draft', 're-evaluation')
+                  AND res.active
+            ) AS ranked
+            WHERE res.id = ranked.id""", (tuple(self.ids),))
+        results = result_obj.search([('s_exam_ids', 'in', self.ids)])
+        results.invalidate_cache(['class_rank', 'standard_rank',
+                                  'percentile'], results.ids)
+        return True
+
+    def get_subject_toppers(self, limit=3, standard_ids=None):
+        '''Return the top students of every subject of the exams.
+
+        The subject lines are ranked by the database on their final marks,
+        the students sharing a mark sharing the rank.
+        @param limit : number of ranks to return per subject
+        @param standard_ids : ids of the school standards, all when not given
+        @return : dictionary mapping a subject id to a list of
+                  (rank, result id, marks) tuples, best first
+        '''
+        if not self:
+            return {}
+        self.env['exam.result'].flush(['s_exam_ids', 'standard_id', 'state',
+                                       'active'])
+        self.env['exam.subject'].flush(['exam_id', 'subject_id',
+                                        'obtain_marks', 'marks_reeval'])
+        where = ''
+        params = [tuple(self.ids)]
+        if standard_ids:
+            where = 'AND res.standard_id IN %s'
+            params.append(tuple(standard_ids))
+        params.append(limit)
+        self._cr.execute("""
+            SELECT subject_id, subject_rank, result_id, marks
+            FROM (
+                SELECT subject_id, result_id, marks,
+                       RANK() OVER (PARTITION BY subject_id
+                                    ORDER BY marks DESC) AS subject_rank
+                FROM (
+                    SELECT sub.subject_id, res.id AS result_id,
+                           CASE WHEN res.state = 're-evaluation'
+                                THEN sub.marks_reeval
+                                ELSE sub.obtain_marks END AS marks
+                    FROM exam_subject sub
+                    JOIN exam_result res ON res.id = sub.exam_id
+                    WHERE res.s_exam_ids IN %s AND res.state != 'draft'
+                      AND res.active AND sub.subject_id IS NOT NULL
+                      """ + where + """
+                ) AS marks
+            ) AS ranked
+            WHERE subject_rank <= %s
+            ORDER BY subject_id, subject_rank, result_id""", params)
+        toppers = {}
+        for subject_id, rank, result_id, marks in self._cr.fetchall():
+            toppers.setdefault(subject_id, []).append((rank, result_id, marks))
+        return toppers
 
 
 class ExamScheduleLine(models.Model):
@@ -371,6 +645,38 @@ minimum marks!'''))
         vals.update({'write_date': new_dt})
         return super(AdditionalExam, self).write(vals)
 
+    def create_results(self, marks):
+        '''Enter the results of a whole class for the additional exam.
+
+        The students are read once, all the marks are checked before
+        anything is written and the results are created with a single
+        create call.
+        @param marks : list of (student id, obtained marks) pairs
+        @return : recordset of the created results
+        '''
+        self.ensure_one()
+        maximum_marks = self.subject_id.maximum_marks
+        students = {student['id']: student for student in
+                    self.env['student.student'].search_read(
+                        [('id', 'in', [student_id for student_id, obtain_marks
+                                       in marks])], ['name'])}
+        errors = []
+        for student_id, obtain_marks in marks:
+            student = students.get(student_id)
+            if not student:
+                errors.append(_('Student %s does not exist!') % student_id)
+            elif not 0 <= obtain_marks <= maximum_marks:
+                errors.append(_('The marks %s of %s should be between 0 '
+                                'and %s!') % (obtain_marks, student['name'],
+                                              maximum_marks))
+        if errors:
+            raise ValidationError('\n'.join(errors))
+        return self.env['additional.exam.result'].create(
+            [{'a_exam_id': self.id,
+              'student_id': student_id,
+              'obtain_marks': obtain_marks}
+             for student_id, obtain_marks in marks])
+
 
 class ExamResult(models.Model):
     """Defining Exam Result."""
@@ -380,67 +686,66 @@ class ExamResult(models.Model):
     _rec_name = 'roll_no_id'
     _description = 'exam result Information'
 
-    @api.depends('result_ids', 'result_ids.obtain_marks',
+    @api.depends('state', 'result_ids.obtain_marks',
                  'result_ids.marks_reeval')
     def _compute_total(self):
         '''Method to compute total'''
         for rec in self:
             total = 0.0
-            if rec.result_ids:
-                for line in rec.result_ids:
-                    obtain_marks = line.obtain_marks
-                    if line.state == "re-evaluation":
-                        obtain_marks = line.marks_reeval
-                    total += obtain_marks
+            for line in rec.result_ids:
+                obtain_marks = line.obtain_marks
+                if rec.state == "re-evaluation":
+                    obtain_marks = line.marks_reeval
+                total += obtain_marks
             rec.total = total
 
-    @api.depends('total')
+    @api.depends('total', 'result_ids.maximum_marks', 'grade_system',
+                 'grade_system.grade_ids.from_mark',
+                 'grade_system.grade_ids.to_mark',
+                 'grade_system.grade_ids.grade')
     def _compute_per(self):
-        '''Method to compute percentage'''
-        total = 0.0
-        obtained_total = 0.0
-        obtain_marks = 0.0
-        per = 0.0
+        '''Method to compute percentage and grade'''
+        to_grade = {}
         for result in self:
-            for sub_line in result.result_ids:
-                if sub_line.state == "re-evaluation":
-                    obtain_marks = sub_line.marks_reeval
-                else:
-                    obtain_marks = sub_line.obtain_marks
-                total += sub_line.maximum_marks or 0
-                obtained_total += obtain_marks
-            if total > 1.0:
-                per = (obtained_total / total) * 100
-                if result.grade_system:
-                    for grade_id in result.grade_system.grade_ids:
-                        if per >= grade_id.from_mark and\
-                                per <= grade_id.to_mark:
-                            result.grade = grade_id.grade or ''
+            maximum_total = sum(result.result_ids.mapped('maximum_marks'))
+            per = 0.0
+            if maximum_total > 1.0:
+                per = (result.total / maximum_total) * 100
             result.percentage = per
-
-    @api.depends('percentage')
+            result.grade = False
+            if per and result.grade_system:
+                to_grade.setdefault(result.grade_system, []).append(result)
+        # Grade the results of each grade system in one pass.
+        for grade_system, results in to_grade.items():
+            grade_ids = grade_system.get_grade_line_ids(
+                [result.percentage for result in results])
+            grade_lines = self.env['grade.line'].browse(
+                [grade_id for grade_id in grade_ids if grade_id])
+            grades = {line.id: line.grade for line in grade_lines}
+            for result, grade_id in zip(results, grade_ids):
+                result.grade = grades.get(grade_id) or False
+
+    @api.depends('result_ids.grade_line_id.fail')
     def _compute_result(self):
         '''Method to compute result'''
         for rec in self:
-            flag = False
+            rec.result = False
             if rec.result_ids:
-                for grade in rec.result_ids:
-                    if not grade.grade_line_id.fail:
-                            rec.result = 'Pass'
-                    else:
-                        flag = True
-            if flag:
-                rec.result = 'Fail'
-
-    @api.model
-    def create(self, vals):
-        if vals.get('student_id'):
-            student = self.env['student.student'].browse(vals.get('student_id'
-                                                                  ))
-            vals.update({'roll_no_id': student.roll_no,
-                         'standard_id': student.standard_id.id
-                         })
-        return super(ExamResult, self).create(vals)
+                failed = rec.result_ids.filtered('grade_line_id.fail')
+                rec.result = failed and 'Fail' or 'Pass'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        students = self.env['student.student'].browse(
+            [vals['student_id'] for vals in vals_list
+             if vals.get('student_id')])
+        student_data = {student.id: {'roll_no_id': student.roll_no,
+                                     'standard_id': student.standard_id.id}
+                        for student in students}
+        for vals in vals_list:
+            if vals.get('student_id'):
+                vals.update(student_data[vals['student_id']])
+        return super(ExamResult, self).create(vals_list)
 
     def write(self, vals):
         if vals.get('student_id'):
@@ -449,7 +754,12 @@ class ExamResult(models.Model):
             vals.update({'roll_no_id': student.roll_no,
                          'standard_id': student.standard_id.id
                          })
-        return super(ExamResult, self).write(vals)
+        res = super(ExamResult, self).write(vals)
+        # Results set back to draft or under re-evaluation leave the
+        # ranking, the other results of their exams are ranked again.
+        if vals.get('state') in ('draft', 're-evaluation'):
+            self.mapped('s_exam_ids').compute_result_ranks()
+        return res
 
     def unlink(self):
         for rec in self:
@@ -458,6 +768,55 @@ class ExamResult(models.Model):
                 state only!'''))
         return super(ExamResult, self).unlink()
 
+    @api.model
+    def get_pass_statistics(self, year_ids=None, standard_ids=None,
+                            exam_ids=None):
+        '''Return the pass/fail statistics of the finished exams.
+
+        The confirmed results are counted with one grouped query for
+        every exam, standard and academic year at once.
+        @param year_ids : ids of the academic years, all when not given
+        @param standard_ids : ids of the school standards, all when not given
+        @param exam_ids : ids of the exams, all when not given
+        @return : list of dictionaries with the exam, standard and year
+                  records and the appeared, passed and failed counts with
+                  the pass percentage
+        '''
+        domain = [('state', '!=', 'draft'),
+                  ('s_exam_ids.state', '=', 'finished')]
+        if year_ids:
+            domain.append(('s_exam_ids.academic_year', 'in', year_ids))
+        if standard_ids:
+            domain.append(('standard_id', 'in', standard_ids))
+        if exam_ids:
+            domain.append(('s_exam_ids', 'in', exam_ids))
+        stats = {}
+        for group in self.read_group(domain, ['s_exam_ids'],
+                                     ['s_exam_ids', 'standard_id', 'result'],
+                                     lazy=False):
+            key = (group['s_exam_ids'] and group['s_exam_ids'][0],
+                   group['standard_id'] and group['standard_id'][0])
+            counts = stats.setdefault(key, {'Pass': 0, 'Fail': 0, False: 0})
+            counts[group['result'] in ('Pass', 'Fail') and
+                   group['result'] or False] += group['__count']
+        exams = self.env['exam.exam'].browse([key[0] for key in stats])
+        standards = self.env['school.standard'].browse(
+            [key[1] for key in stats])
+        res = []
+        for (exam_id, standard_id), counts in sorted(stats.items(),
+                                                     key=lambda item: item[0]):
+            exam = exams.browse(exam_id)
+            appeared = sum(counts.values())
+            res.append({'exam': exam,
+                        'standard': standards.browse(standard_id),
+                        'year': exam.academic_year,
+                        'student_appear': appeared,
+                        'pass_student': counts['Pass'],
+                        'fail_student': counts['Fail'],
+                        'pass_std': appeared and round(
+                            100.0 * counts['Pass'] / appeared, 2) or 0.0})
+        return res
+
     @api.onchange('student_id')
     def onchange_student(self):
         '''Method to get standard and roll no of student selected'''
@@ -482,7 +841,7 @@ class ExamResult(models.Model):
     total = fields.Float(compute='_compute_total', string='Obtain Total',
                          store=True, help="Total of marks")
     percentage = fields.Float("Percentage", compute="_compute_per",
-                              store=True,
+                              store=True, group_operator="avg",
                               help="Percentage Obtained")
     result = fields.Char(compute='_compute_result', string='Result',
                          store=True, help="Result Obtained")
@@ -501,6 +860,16 @@ class ExamResult(models.Model):
     active = fields.Boolean('Active', default=True)
     grade_system = fields.Many2one('grade.master', "Grade System",
                                    help="Grade System selected")
+    class_rank = fields.Integer('Class Rank', readonly=True, copy=False,
+                                help="Rank of the student in the class")
+    standard_rank = fields.Integer('Standard Rank', readonly=True,
+                                   copy=False,
+                                   help="Rank of the student among all the "
+                                        "divisions of the standard")
+    percentile = fields.Float('Percentile', readonly=True, copy=False,
+                              group_operator="avg",
+                              help="Share of the students of the standard "
+                                   "scoring at most this percentage")
     message_ids = fields.One2many('mail.message', 'res_id', 'Messages',
                                   domain=lambda self: [('model', '=',
                                                         self._name)],
@@ -527,22 +896,21 @@ class ExamResult(models.Model):
                       line.obtain_marks):
                     raise ValidationError(_('Kindly add marks\
                         details of subject "%s"!') % (line.subject_id.name))
-            vals = {'grade': rec.grade,
-                    'percentage': rec.percentage,
-                    'state': 'confirm'
-                    }
-            rec.write(vals)
+            rec.write({'state': 'confirm'})
+        self.mapped('s_exam_ids').compute_result_ranks()
 
     def re_evaluation_confirm(self):
         '''Method to change state to re_evaluation_confirm'''
         self.state = 're-evaluation_confirm'
+        self.mapped('s_exam_ids').compute_result_ranks()
 
     def result_re_evaluation(self):
         '''Method to set state to re-evaluation'''
         for rec in self:
             for line in rec.result_ids:
                 line.marks_reeval = line.obtain_marks
-            rec.state = 're-evaluation'
+        # One write so that the exams are ranked again only once.
+        self.write({'state': 're-evaluation'})
 
     def set_done(self):
         '''Method to obtain history of student'''
@@ -590,31 +958,43 @@ class ExamSubject(models.Model):
                     'marks_reeval')
     def _validate_marks(self):
         '''Method to validate marks'''
-        if self.obtain_marks > self.maximum_marks:
-            raise ValidationError(_('''The obtained marks
-            should not extend maximum marks!'''))
-        if self.minimum_marks > self.maximum_marks:
-            raise ValidationError(_('''The minimum marks
-            should not extend maximum marks!'''))
-        if(self.marks_reeval > self.maximum_marks):
-            raise ValidationError(_('''The revaluation marks
-            should not extend maximum marks!'''))
-
-    @api.depends('exam_id', 'obtain_marks', 'marks_reeval')
+        for rec in self:
+            if rec.obtain_marks > rec.maximum_marks:
+                raise ValidationError(_('''The obtained marks
+                should not extend maximum marks!'''))
+            if rec.minimum_marks > rec.maximum_marks:
+                raise ValidationError(_('''The minimum marks
+                should not extend maximum marks!'''))
+            if(rec.marks_reeval > rec.maximum_marks):
+                raise ValidationError(_('''The revaluation marks
+                should not extend maximum marks!'''))
+
+    @api.depends('exam_id.student_id', 'exam_id.grade_system',
+                 'exam_id.grade_system.grade_ids.from_mark',
+                 'exam_id.grade_system.grade_ids.to_mark',
+                 'obtain_marks', 'marks_reeval')
     def _compute_grade(self):
         '''Method to compute grade after re-evaluation'''
+        grade_line_obj = self.env['grade.line']
+        to_grade = {}
         for rec in self:
-            grade_lines = rec.exam_id.grade_system.grade_ids
-            if (rec.exam_id and rec.exam_id.student_id and grade_lines):
-                for grade_id in grade_lines:
-                    if rec.obtain_marks and rec.marks_reeval <= 0.0:
-                        b_id = rec.obtain_marks <= grade_id.to_mark
-                        if (rec.obtain_marks >= grade_id.from_mark and b_id):
-                            rec.grade_line_id = grade_id
-                    if rec.marks_reeval and rec.obtain_marks >= 0.0:
-                        r_id = rec.marks_reeval <= grade_id.to_mark
-                        if (rec.marks_reeval >= grade_id.from_mark and r_id):
-                            rec.grade_line_id = grade_id
+            rec.grade_line_id = False
+            if not (rec.exam_id.student_id and rec.exam_id.grade_system):
+                continue
+            if rec.marks_reeval and rec.obtain_marks >= 0.0:
+                marks = rec.marks_reeval
+            elif rec.obtain_marks and rec.marks_reeval <= 0.0:
+                marks = rec.obtain_marks
+            else:
+                continue
+            to_grade.setdefault(rec.exam_id.grade_system, []).append(
+                (rec, marks))
+        # Grade the lines of each grade system in one pass.
+        for grade_system, lines in to_grade.items():
+            grade_ids = grade_system.get_grade_line_ids(
+                [marks for rec, marks in lines])
+            for (rec, marks), grade_id in zip(lines, grade_ids):
+                rec.grade_line_id = grade_line_obj.browse(grade_id)
 
     exam_id = fields.Many2one('exam.result', 'Result')
     state = fields.Selection([('draft', 'Draft'), ('confirm', 'Confirm'),
@@ -631,7 +1011,7 @@ class ExamSubject(models.Model):
     marks_reeval = fields.Float("Marks After Re-evaluation",
                                 help="Marks Obtain after Re-evaluation")
     grade_line_id = fields.Many2one('grade.line', "Grade",
-                                    compute='_compute_grade')
+                                    compute='_compute_grade', store=True)
 
 
 class AdditionalExamResult(models.Model):
@@ -641,32 +1021,42 @@ class AdditionalExamResult(models.Model):
     _description = 'subject result Information'
     _rec_name = 'roll_no_id'
 
-    @api.depends('a_exam_id', 'obtain_marks')
+    @api.depends('a_exam_id.minimum_marks', 'obtain_marks')
     def _compute_student_result(self):
         '''Method to compute result of student'''
         for rec in self:
-            if rec.a_exam_id and rec.a_exam_id:
+            rec.result = False
+            if rec.a_exam_id:
                 if rec.a_exam_id.minimum_marks < \
                         rec.obtain_marks:
                     rec.result = 'Pass'
                 else:
                     rec.result = 'Fail'
 
-    @api.model
-    def create(self, vals):
+    def _get_student_values(self, student_ids):
+        '''Return the roll no and standard of the students, read at once'''
+        return {student['id']: {'roll_no_id': student['roll_no'],
+                                'standard_id': student['standard_id'] and
+                                student['standard_id'][0]}
+                for student in self.env['student.student'].browse(
+                    student_ids).read(['roll_no', 'standard_id'])}
+
+    @api.model_create_multi
+    def create(self, vals_list):
         '''Override create method to get roll no and standard'''
-        student = self.env['student.student'].browse(vals.get('student_id'))
-        vals.update({'roll_no_id': student.roll_no,
-                     'standard_id': student.standard_id.id
-                     })
-        return super(AdditionalExamResult, self).create(vals)
+        student_vals = self._get_student_values(
+            [vals['student_id'] for vals in vals_list
+             if vals.get('student_id')])
+        for vals in vals_list:
+            if vals.get('student_id'):
+                vals.update(student_vals[vals['student_id']])
+        return super(AdditionalExamResult, self).create(vals_list)
 
     def write(self, vals):
         '''Override write method to get roll no and standard'''
-        student = self.env['student.student'].browse(vals.get('student_id'))
-        vals.update({'roll_no_id': student.roll_no,
-                     'standard_id': student.standard_id.id
-                     })
+        if vals.get('student_id'):
+            vals.update(self._get_student_values(
+                [vals['student_id']])[vals['student_id']])
         return super(AdditionalExamResult, self).write(vals)
 
     @api.onchange('student_id')
@@ -677,9 +1067,10 @@ class AdditionalExamResult(models.Model):
 
     @api.constrains('obtain_marks')
     def _validate_obtain_marks(self):
-        if self.obtain_marks > self.a_exam_id.subject_id.maximum_marks:
-            raise ValidationError(_('''The obtained marks should not extend \
-maximum marks!'''))
+        for rec in self:
+            if rec.obtain_marks > rec.a_exam_id.subject_id.maximum_marks:
+                raise ValidationError(_('''The obtained marks should not \
+extend maximum marks!'''))
 
     a_exam_id = fields.Many2one('additional.exam', 'Additional Examination',
                                 required=True,
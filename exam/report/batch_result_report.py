@@ -8,30 +8,10 @@ class BatchExamReport(models.AbstractModel):
     _description = "Batch wise Exam Result"
 
     def pass_student(self, year, standard_id):
-        '''Method to determine students who pass the exam'''
-        exam = self.env['exam.exam'].search([('standard_id', '=',
-                                              standard_id.id),
-                                             ('academic_year', '=', year.id),
-                                             ('state', '=', 'finished')])
-        result_obj = self.env['exam.result']
-        for rec in exam:
-            exam_result = result_obj.search([('s_exam_ids', '=', rec.id),
-                                             ('state', '!=', 'draft')])
-            exam_result_pass = result_obj.search([('s_exam_ids', '=', rec.id),
-                                                  ('result', '=', 'Pass'),
-                                                  ('state', '!=', 'draft')])
-            exam_result_fail = result_obj.search([('s_exam_ids', '=', rec.id),
-                                                  ('result', '=', 'Fail'),
-                                                  ('state', '!=', 'draft')])
-            std_pass = ''
-            if len(exam_result_pass.ids) > 0:
-                # Calculate percentage of students who pass the exams
-                std_pass = ((100 * len(exam_result_pass.ids)) /
-                            len(exam_result.ids))
-            return [{'student_appear': len(exam_result.ids) or 0.0,
-                     'studnets': len(exam_result_pass.ids) or 0.0,
-                     'pass_std': std_pass or 0.0,
-                     'fail_student': len(exam_result_fail.ids) or 0.0}]
+        '''Method to get the pass/fail statistics of every finished exam
+        of the year for the standard'''
+        return self.env['exam.result'].get_pass_statistics(
+            year_ids=year.ids, standard_ids=standard_id.ids)
 
     @api.model
     def _get_report_values(self, docids, data=None):
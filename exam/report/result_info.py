@@ -37,37 +37,47 @@ class ReportResultInfo(models.AbstractModel):
         list_exam = []
         value = {}
         final_total = 0
-        per = 0.0
         obtain_marks = 0.0
         maximum_marks = 0.0
         for res in result_id:
-            if res.result_ids:
-                for res_data in res.result_ids:
-                    obtain_marks += float(res_data.obtain_marks)
-                    maximum_marks += float(res_data.maximum_marks)
-                per += obtain_marks * 100 / maximum_marks
+            for res_data in res.result_ids:
+                obtain_marks += float(res_data.obtain_marks)
+                maximum_marks += float(res_data.maximum_marks)
             final_total = final_total + res.total
             value.update({'result': res.result,
-                          'percentage': per,
+                          'percentage': maximum_marks and
+                          obtain_marks * 100 / maximum_marks or 0.0,
                           'total': final_total})
         list_exam.append(value)
         return list_exam
 
+    @api.model
+    def _prefetch_results(self, students):
+        '''Load the results of all the students with their subject lines
+        in a few queries, so that rendering a batch of report cards does
+        not query them student by student'''
+        results = self.env['exam.result'].search([('student_id', 'in',
+                                                   students.ids)])
+        results.mapped('s_exam_ids.name')
+        results.mapped('standard_id.standard_id.name')
+        results.mapped('result_ids.subject_id.code')
+        return results
+
     @api.model
     def _get_report_values(self, docids, data=None):
         docs = self.env['student.student'].browse(docids)
         student_model = self.env['ir.actions.report']._get_report_from_name(
             'exam.result_information_report')
+        results = self._prefetch_results(docs)
+        students = results.mapped('student_id')
         for rec in docs:
-            student_search = self.env['exam.result'].search([('student_id',
-                                                              '=', rec.id)])
-            if not student_search or rec.state == 'draft':
+            if rec not in students or rec.state == 'draft':
                 raise ValidationError(_('''You cannot print report for student
                 in unconfirm state or when data is not found !'''))
-            return {'doc_ids': docids,
-                    'doc_model': student_model.model,
-                    'data': data,
-                    'docs': docs,
-                    'get_lines': self.get_lines,
-                    'get_exam_data': self.get_exam_data,
-                    }
+        return {'doc_ids': docids,
+                'doc_model': student_model.model,
+                'data': data,
+                'docs': docs,
+                'get_lines': self.get_lines,
+                'get_exam_data': self.get_exam_data,
+                }
@@ -2,6 +2,7 @@
 
 from odoo.tests import common
 from odoo.tools import config
+from odoo.exceptions import ValidationError, UserError
 import os
 import time
 
@@ -146,3 +147,179 @@ class TestExam(common.TransactionCase):
                          self.exam_schedule_line.standard_id.id)
         self.assertIn(self.exam_schedule_line.standard_id.id,
                       self.exam_exam.standard_id.ids)
+
+    def test_generate_result(self):
+        action = self.exam_exam.generate_result()
+        result_ids = action['domain'][0][2]
+        results = self.exam_result_obj.browse(result_ids)
+        for result in results:
+            self.assertEqual(len(result.result_ids),
+                             len(self.time_table.timetable_ids))
+        count = self.exam_result_obj.search_count(
+            [('s_exam_ids', '=', self.exam_exam.id)])
+        self.exam_exam.generate_result_background()
+        self.exam_exam_obj._cron_generate_results()
+        self.assertEqual(self.exam_exam.result_generation, 'done')
+        self.assertEqual(self.exam_result_obj.search_count(
+            [('s_exam_ids', '=', self.exam_exam.id)]), count)
+
+    def test_result_totals(self):
+        result = self.exam_result_obj.create({
+            's_exam_ids': self.exam_exam.id,
+            'student_id': self.student.id,
+            'grade_system': self.grade_system.id,
+            'result_ids': [(0, 0, {'subject_id': self.subject_id.id,
+                                   'maximum_marks': 100,
+                                   'minimum_marks': 35,
+                                   'obtain_marks': 90}),
+                           (0, 0, {'subject_id': self.subject_id.id,
+                                   'maximum_marks': 100,
+                                   'minimum_marks': 35,
+                                   'obtain_marks': 80})]})
+        self.assertEqual(result.total, 170)
+        self.assertEqual(result.percentage, 85)
+        self.assertEqual(result.grade, 'A')
+        self.assertEqual(result.result, 'Pass')
+        result.result_ids[1].obtain_marks = 10
+        self.assertEqual(result.percentage, 50)
+        self.assertEqual(result.result, 'Fail')
+        groups = self.exam_result_obj.read_group(
+            [('id', '=', result.id)], ['percentage'], ['result'])
+        self.assertEqual(groups[0]['result'], 'Fail')
+        self.assertEqual(groups[0]['percentage'], 50)
+
+    def test_pass_statistics(self):
+        self.exam_exam.state = 'finished'
+        stats = self.exam_result_obj.get_pass_statistics(
+            year_ids=self.year_id.ids, exam_ids=self.exam_exam.ids)
+        results = self.exam_result_obj.search(
+            [('s_exam_ids', '=', self.exam_exam.id),
+             ('state', '!=', 'draft')])
+        self.assertEqual(sum(stat['student_appear'] for stat in stats),
+                         len(results))
+        for stat in stats:
+            self.assertEqual(stat['exam'], self.exam_exam)
+            self.assertEqual(stat['year'], self.year_id)
+            self.assertLessEqual(stat['pass_student'] + stat['fail_student'],
+                                 stat['student_appear'])
+
+    def test_result_ranks(self):
+        classmate = self.env['student.student'].search(
+            [('standard_id', '=', self.student_student.standard_id.id),
+             ('id', '!=', self.student_student.id)], limit=1)
+        self.assertTrue(classmate)
+        results = self.exam_result_obj.create([{
+            's_exam_ids': self.exam_exam.id,
+            'student_id': student.id,
+            'grade_system': self.grade_system.id,
+            'result_ids': [(0, 0, {'subject_id': self.subject_id.id,
+                                   'maximum_marks': 100,
+                                   'minimum_marks': 35,
+                                   'obtain_marks': marks})]}
+            for student, marks in ((self.student_student, 60),
+                                   (classmate, 90))])
+        results.result_confirm()
+        self.assertEqual(results[1].class_rank, 1)
+        self.assertEqual(results[0].class_rank, 2)
+        self.assertTrue(results[1].percentile > results[0].percentile)
+        toppers = self.exam_exam.get_subject_toppers(limit=1)
+        self.assertEqual(toppers[self.subject_id.id][0][0], 1)
+        self.assertEqual(toppers[self.subject_id.id][0][2], 90)
+        # A result under re-evaluation leaves the ranking.
+        results[1].result_re_evaluation()
+        self.assertFalse(results[1].class_rank)
+        self.assertEqual(results[0].class_rank, 1)
+        results[1].re_evaluation_confirm()
+        self.assertEqual(results[1].class_rank, 1)
+        self.assertEqual(results[0].class_rank, 2)
+
+    def test_marks_matrix(self):
+        result = self.exam_result_obj.create({
+            's_exam_ids': self.exam_exam.id,
+            'student_id': self.student_student.id,
+            'grade_system': self.grade_system.id,
+            'result_ids': [(0, 0, {'subject_id': self.subject_id.id,
+                                   'maximum_marks': 100,
+                                   'minimum_marks': 35})]})
+        standard_id = result.standard_id.id
+        with self.assertRaises(ValidationError):
+            self.exam_exam.set_marks_matrix(
+                standard_id,
+                {self.student_student.id: {self.subject_id.id: 120}})
+        results = self.exam_exam.set_marks_matrix(
+            standard_id, {self.student_student.id: {self.subject_id.id: 75}})
+        self.assertIn(result, results)
+        self.assertEqual(result.result_ids.obtain_marks, 75)
+        self.assertEqual(result.total, 75)
+        # A duplicate draft result is reported instead of being skipped.
+        result.copy()
+        with self.assertRaises(UserError):
+            self.exam_exam.set_marks_matrix(
+                standard_id,
+                {self.student_student.id: {self.subject_id.id: 80}})
+
+    def test_exam_conflicts(self):
+        time_table = self.time_table_obj.create({
+            'name': 'Unit Test',
+            'year_id': self.year_id.id,
+            'timetable_type': 'exam',
+            'standard_id': self.standards.id})
+        line_vals = {'exm_date': self.time_table_line.exm_date,
+                     'subject_id': self.subject_id.id,
+                     'start_time': 12.00,
+                     'end_time': 13.00,
+                     'teacher_id': self.env.ref(
+                         'school.demo_school_teacher_1').id,
+                     'table_id': time_table.id,
+                     'class_room_id': self.room_id.id}
+        line = self.time_table_line_obj.create(line_vals)
+        self.assertFalse(line.get_exam_conflicts())
+        with self.assertRaises(ValidationError):
+            line.write({'start_time': 11.00})
+
+    def test_report_cards(self):
+        wizard = self.env['exam.report.card'].create({
+            'exam_id': self.exam_exam.id,
+            'standard_id': self.school_standard.id})
+        self.assertIn(self.student_student, wizard._get_students())
+        action = wizard.generate_report_cards()
+        self.assertEqual(action['type'], 'ir.actions.act_url')
+        self.assertEqual(wizard.attachment_id.res_id, self.exam_exam.id)
+
+    def test_promotion_plan(self):
+        wizard = self.env['move.standards'].create({
+            'academic_year_id': self.student_student.year.id})
+        moves, skipped = wizard._get_promotion_plan()
+        for (year_id, standard_id, promoted), student_ids in moves.items():
+            self.assertTrue(year_id)
+            self.assertTrue(student_ids)
+        wizard.preview_move()
+        self.assertTrue(wizard.promotion_report)
+        # A last result without any outcome keeps the student back.
+        student = self.student_student
+        self.env['student.history'].create({
+            'student_id': student.id,
+            'academice_year_id': wizard.academic_year_id.id,
+            'standard_id': student.standard_id.id})
+        result = self.exam_result_obj.create({
+            's_exam_ids': self.exam_exam.id,
+            'student_id': student.id})
+        self.assertFalse(result.result)
+        moves, skipped = wizard._get_promotion_plan()
+        self.assertNotIn(student.id, skipped.get('No exam result', []))
+        kept_back = any(student.id in student_ids for (
+            year_id, standard_id, promoted), student_ids in moves.items()
+            if not promoted)
+        self.assertTrue(kept_back or student.id in skipped.get(
+            'No next academic year', []))
+
+    def test_additional_exam_results(self):
+        results = self.additional_exam.create_results(
+            [(self.student.id, 20), (self.student_student.id, 70)])
+        self.assertEqual(results.mapped('result'), ['Fail', 'Pass'])
+        self.assertEqual(results[1].roll_no_id, self.student_student.roll_no)
+        results[1].write({'obtain_marks': 80})
+        self.assertEqual(results[1].standard_id,
+                         self.student_student.standard_id)
+        with self.assertRaises(ValidationError):
+            self.additional_exam.create_results([(self.student.id, 1000)])
@@ -4,3 +4,5 @@ from . import subject_result
 from . import move_standards
 from . import batch_result
 from . import terminate_reason
+from . import marks_entry
+from . import report_card
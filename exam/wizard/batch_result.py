@@ -11,7 +11,8 @@ class BatchExamResult(models.TransientModel):
 
     standard_id = fields.Many2one("school.standard",
                                   "Standard",
-                                  help="select standard")
+                                  help="select standard, leave empty to "
+                                       "print every standard")
     year = fields.Many2one('academic.year', 'Academic Year',
                            help="Select Academic Year")
 
@@ -0,0 +1,75 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import models, fields, api
+
+
+class ExamMarksEntry(models.TransientModel):
+    '''Grid to enter the marks of a whole class for an exam.'''
+
+    _name = 'exam.marks.entry'
+    _description = 'Exam Marks Entry'
+
+    exam_id = fields.Many2one('exam.exam', 'Exam', required=True,
+                              domain=[('state', 'in',
+                                       ['running', 'finished'])])
+    standard_id = fields.Many2one('school.standard', 'Class', required=True)
+    line_ids = fields.One2many('exam.marks.entry.line', 'entry_id', 'Marks')
+
+    @api.model
+    def default_get(self, fields):
+        '''Override default method to get the exam from the context'''
+        res = super(ExamMarksEntry, self).default_get(fields)
+        if self._context.get('active_model') == 'exam.exam':
+            res.update({'exam_id': self._context.get('active_id')})
+        return res
+
+    def load_marks(self):
+        '''Method to fill the grid with the draft results of the class'''
+        self.ensure_one()
+        lines = self.env['exam.subject'].search_read(
+            [('exam_id.s_exam_ids', '=', self.exam_id.id),
+             ('exam_id.standard_id', '=', self.standard_id.id),
+             ('exam_id.state', '=', 'draft')],
+            ['exam_id', 'subject_id', 'maximum_marks', 'obtain_marks'])
+        results = {result['id']: result['student_id'][0]
+                   for result in self.env['exam.result'].search_read(
+                       [('id', 'in', list({line['exam_id'][0]
+                                           for line in lines}))],
+                       ['student_id'])}
+        self.line_ids = [(5, 0, 0)] + [
+            (0, 0, {'student_id': results[line['exam_id'][0]],
+                    'subject_id': line['subject_id'] and
+                    line['subject_id'][0],
+                    'maximum_marks': line['maximum_marks'],
+                    'obtain_marks': line['obtain_marks']})
+            for line in lines]
+        return {'type': 'ir.actions.act_window',
+                'res_model': self._name,
+                'res_id': self.id,
+                'view_mode': 'form',
+                'target': 'new'}
+
+    def save_marks(self):
+        '''Method to write the marks of the grid in one batch'''
+        self.ensure_one()
+        marks = {}
+        for line in self.line_ids:
+            marks.setdefault(line.student_id.id, {})[line.subject_id.id] = \
+                line.obtain_marks
+        self.exam_id.set_marks_matrix(self.standard_id.id, marks)
+        return {'type': 'ir.actions.act_window_close'}
+
+
+class ExamMarksEntryLine(models.TransientModel):
+    '''Marks of a student for a subject in the marks entry grid.'''
+
+    _name = 'exam.marks.entry.line'
+    _description = 'Exam Marks Entry Line'
+    _order = 'student_id, subject_id'
+
+    entry_id = fields.Many2one('exam.marks.entry', 'Marks Entry',
+                               ondelete='cascade')
+    student_id = fields.Many2one('student.student', 'Student', readonly=True)
+    subject_id = fields.Many2one('subject.subject', 'Subject', readonly=True)
+    maximum_marks = fields.Float('Maximum Marks', readonly=True)
+    obtain_marks = fields.Float('Obtain Marks')
@@ -1,63 +1,162 @@
 # See LICENSE file for full copyright and licensing details.
 
-from odoo import models, api
+from odoo import models, fields, _
 
 
 class MoveStandards(models.TransientModel):
     _inherit = 'move.standards'
 
+    promotion_report = fields.Text('Promotion Preview', readonly=True)
+
+    def _get_last_results(self, student_ids):
+        '''Return the result of the last exam of every student in his
+        current standard, read with one query
+        @param student_ids : ids of the students
+        @return : dictionary mapping a student id to 'Pass' or 'Fail'
+        '''
+        if not student_ids:
+            return {}
+        self.env['exam.result'].flush(['student_id', 'standard_id', 'result',
+                                       'active'])
+        self.env['student.student'].flush(['standard_id'])
+        self._cr.execute("""
+            SELECT DISTINCT ON (res.student_id) res.student_id, res.result
+            FROM exam_result res
+            JOIN student_student stu ON stu.id = res.student_id
+            WHERE res.student_id IN %s AND res.active
+              AND res.standard_id = stu.standard_id
+            ORDER BY res.student_id, res.id DESC""", (tuple(student_ids),))
+        return dict(self._cr.fetchall())
+
+    def _get_promotion_plan(self):
+        '''Compute where every done student moves after the exams.
+
+        The next year and next standard of every sequence, the school
+        standards and the exam results are read once for the whole
+        school instead of student by student.
+        @return : dictionary mapping a (year id, school standard id,
+                  promoted) key to the list of the student ids moving
+                  there, and a dictionary mapping a reason to the ids of
+                  the students left where they are
+        '''
+        self.ensure_one()
+        students = self.env['student.student'].search_read(
+            [('state', '=', 'done')],
+            ['year', 'standard_id', 'school_id', 'medium_id'])
+        history = {hist['student_id'][0] for hist in
+                   self.env['student.history'].search_read(
+                       [('academice_year_id', '=', self.academic_year_id.id),
+                        ('student_id', 'in',
+                         [stud['id'] for stud in students])],
+                       ['student_id']) if hist['student_id']}
+        students = [stud for stud in students if stud['id'] in history]
+        results = self._get_last_results([stud['id'] for stud in students])
+
+        # Same rules as academic.year.next_year and
+        # standard.standard.next_standard: the first record by id with a
+        # greater sequence.
+        years = self.env['academic.year'].search_read([], ['sequence'],
+                                                      order='id')
+        year_seq = {year['id']: year['sequence'] for year in years}
+        next_years = {}
+        classes = self.env['standard.standard'].search_read([], ['sequence'],
+                                                            order='id')
+        class_seq = {cls['id']: cls['sequence'] for cls in classes}
+        next_classes = {}
+        school_standards = {}
+        standard_keys = {}
+        for std in self.env['school.standard'].search_read(
+                [], ['standard_id', 'division_id', 'school_id', 'medium_id'],
+                order='id'):
+            key = tuple(std[fname] and std[fname][0] for fname in
+                        ('standard_id', 'division_id', 'school_id',
+                         'medium_id'))
+            standard_keys[std['id']] = key
+            school_standards.setdefault(key, std)
+
+        moves = {}
+        skipped = {}
+        for stud in students:
+            if stud['id'] not in results or not stud['standard_id']:
+                skipped.setdefault(_('No exam result'), []).append(stud['id'])
+                continue
+            result = results[stud['id']]
+            sequence = year_seq.get(stud['year'] and stud['year'][0], 0)
+            if sequence not in next_years:
+                next_years[sequence] = next(
+                    (year['id'] for year in years
+                     if year['sequence'] > sequence), False)
+            year_id = next_years[sequence]
+            if not year_id:
+                skipped.setdefault(_('No next academic year'), []).append(
+                    stud['id'])
+                continue
+            standard_id = stud['standard_id'][0]
+            # A result which is not a pass, even an empty one, keeps the
+            # student back.
+            if result != 'Pass':
+                moves.setdefault((year_id, standard_id, False), []).append(
+                    stud['id'])
+                continue
+            class_id, division_id = standard_keys.get(standard_id,
+                                                      (False, False))[:2]
+            std_sequence = class_seq.get(class_id, 0)
+            if std_sequence not in next_classes:
+                next_classes[std_sequence] = next(
+                    (cls['id'] for cls in classes
+                     if cls['sequence'] > std_sequence), False)
+            next_class = next_classes[std_sequence]
+            if not next_class:
+                skipped.setdefault(_('Last standard'), []).append(stud['id'])
+                continue
+            next_stand = school_standards.get(
+                (next_class, division_id,
+                 stud['school_id'] and stud['school_id'][0],
+                 stud['medium_id'] and stud['medium_id'][0]))
+            if not next_stand:
+                skipped.setdefault(_('No next class'), []).append(stud['id'])
+                continue
+            moves.setdefault((year_id, next_stand['id'], True), []).append(
+                stud['id'])
+        return moves, skipped
+
+    def _format_promotion_plan(self, moves, skipped):
+        '''Return the promotion plan as a readable text'''
+        lines = []
+        years = self.env['academic.year'].browse([key[0] for key in moves])
+        standards = self.env['school.standard'].browse(
+            [key[1] for key in moves])
+        for (year_id, standard_id, promoted), student_ids in sorted(
+                moves.items()):
+            lines.append(_('%s - %s: %s student(s) %s') % (
+                years.browse(year_id).name,
+                standards.browse(standard_id).name,
+                len(student_ids),
+                promoted and _('promoted') or _('kept back')))
+        for reason, student_ids in sorted(skipped.items()):
+            lines.append(_('Not moved (%s): %s student(s)') % (
+                reason, len(student_ids)))
+        return '\n'.join(lines) or _('No student to move.')
+
+    def preview_move(self):
+        '''Method to show the promotions without moving the students'''
+        for rec in self:
+            rec.promotion_report = rec._format_promotion_plan(
+                *rec._get_promotion_plan())
+        return {'type': 'ir.actions.act_window',
+                'res_model': self._name,
+                'res_id': self.id,
+                'view_mode': 'form',
+                'target': 'new'}
+
     def move_start(self):
         '''Method to change standard of student after he passes the exam'''
-        academic_obj = self.env['academic.year']
-        school_stand_obj = self.env['school.standard']
-        standard_obj = self.env["standard.standard"]
-        result_obj = self.env['exam.result']
         student_obj = self.env['student.student']
-        stud_history_obj = self.env["student.history"]
         for rec in self:
-            # search the done state students
-            for stud in student_obj.search([('state', '=', 'done')]):
-                # check the student history for same academic year
-                stud_year_ids = stud_history_obj.\
-                    search([('academice_year_id', '=',
-                             rec.academic_year_id.id),
-                            ('student_id', '=', stud.id)])
-                year_id = academic_obj.next_year(stud.year.sequence)
-                academic_year = academic_obj.search([('id', '=', year_id)],
-                                                    limit=1)
-                if stud_year_ids:
-                    # search the student result
-                    result_data = result_obj.\
-                        search([('standard_id', '=', stud.standard_id.id),
-                                ('standard_id.division_id',
-                                 '=', stud.standard_id.division_id.id),
-                                ('standard_id.medium_id',
-                                 '=', stud.medium_id.id),
-                                ('student_id', '=', stud.id)])
-                    std_seq = stud.standard_id.standard_id.sequence
-                    for results in result_data:
-                        if results.result == "Pass":
-                            next_class = standard_obj.next_standard(std_seq)
-                            if next_class:
-                                division = (stud.standard_id.division_id.id
-                                            )
-                                # find the school standard record
-                                next_stand = school_stand_obj.\
-                                    search([('standard_id', '=', next_class),
-                                            ('division_id', '=', division),
-                                            ('school_id', '=',
-                                             stud.school_id.id),
-                                            ('medium_id', '=',
-                                             stud.medium_id.id)],
-                                           limit=1)
-                                # standard will change if student pass the exam
-                                stud.write({'year': academic_year.id,
-                                            'standard_id': next_stand.id
-                                            })
-                        else:
-                            # If student is fail he will remain in same
-                            # standard
-                            stud.write({'year': academic_year.id,
-                                        'standard_id': stud.standard_id.id
-                                        })
+            moves, skipped = rec._get_promotion_plan()
+            # One write per target year and standard.
+            for (year_id, standard_id, promoted), student_ids in \
+                    moves.items():
+                student_obj.browse(student_ids).write(
+                    {'year': year_id, 'standard_id': standard_id})
         return True
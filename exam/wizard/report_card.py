@@ -0,0 +1,79 @@
+# See LICENSE file for full copyright and licensing details.
+
+import base64
+import io
+import zipfile
+from odoo import models, fields, _
+from odoo.exceptions import ValidationError
+
+
+class ExamReportCard(models.TransientModel):
+    '''Print the report cards of a whole class or exam at once.'''
+
+    _name = 'exam.report.card'
+    _description = 'Batch Report Cards'
+
+    exam_id = fields.Many2one('exam.exam', 'Exam',
+                              help="Print the students having a result "
+                                   "for this exam")
+    standard_id = fields.Many2one('school.standard', 'Class',
+                                  help="Print the students of this class")
+    chunk_size = fields.Integer('Students Per File', default=200,
+                                help="Number of report cards rendered "
+                                     "together in one PDF file")
+    attachment_id = fields.Many2one('ir.attachment', 'Report Cards',
+                                    readonly=True)
+
+    def _get_students(self):
+        '''Return the students to print, sorted by class and roll no'''
+        self.ensure_one()
+        domain = [('state', '!=', 'draft')]
+        if self.exam_id:
+            domain.append(('s_exam_ids', '=', self.exam_id.id))
+        if self.standard_id:
+            domain.append(('standard_id', '=', self.standard_id.id))
+        results = self.env['exam.result'].search(domain)
+        return results.mapped('student_id').sorted(
+            lambda student: (student.standard_id.id, student.roll_no))
+
+    def generate_report_cards(self):
+        ''' This method renders the report cards class by class, one PDF
+            per chunk of students, and stores them in a single zip file
+            @param self : Object Pointer
+            @return : action downloading the zip file
+        '''
+        self.ensure_one()
+        if not self.exam_id and not self.standard_id:
+            raise ValidationError(_('Please select an exam or a class!'))
+        students = self._get_students()
+        if not students:
+            raise ValidationError(_('No confirmed result found to print!'))
+        report = self.env.ref('exam.result_info_id_qweb')
+        # Every PDF is rendered by one wkhtmltopdf call for the chunk.
+        chunk_size = max(self.chunk_size, 1)
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for standard in students.mapped('standard_id'):
+                class_students = students.filtered(
+                    lambda student: student.standard_id == standard)
+                for start in range(0, len(class_students), chunk_size):
+                    chunk = class_students[start:start + chunk_size]
+                    pdf = report.render_qweb_pdf(chunk.ids)[0]
+                    archive.writestr('%s-%s.pdf' % (
+                        (standard.name or str(standard.id)).replace('/', '-'),
+                        start // chunk_size + 1), pdf)
+        name = 'Report Cards %s.zip' % (self.exam_id.name or
+                                        self.standard_id.name)
+        res_model, res_id = self._name, self.id
+        if self.exam_id:
+            res_model, res_id = 'exam.exam', self.exam_id.id
+        self.attachment_id = self.env['ir.attachment'].create({
+            'name': name,
+            'datas': base64.b64encode(buf.getvalue()),
+            'mimetype': 'application/zip',
+            'res_model': res_model,
+            'res_id': res_id})
+        return {'type': 'ir.actions.act_url',
+                'url': '/web/content/%s?download=true' %
+                self.attachment_id.id,
+                'target': 'self'}
@@ -9,3 +9,4 @@ from . import student
 from . import teacher
 from . import parent
 from . import res_users
+from . import resource_calendar
@@ -0,0 +1,38 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import models, api
+
+
+class ResourceCalendarAttendance(models.Model):
+
+    _inherit = "resource.calendar.attendance"
+
+    @api.model
+    def _refresh_working_days(self, calendars):
+        """Refresh the academic working days of every month when one of
+        the calendars gives the working hours of a school or company."""
+        if calendars and self.env['res.company'].sudo().search_count(
+                [('resource_calendar_id', 'in', calendars.ids)]):
+            month_obj = self.env['academic.month'].sudo()
+            month_obj.search([])._working_days_changed()
+
+    @api.model
+    def create(self, vals):
+        """Inherit Method to refresh the cached academic working days."""
+        res = super(ResourceCalendarAttendance, self).create(vals)
+        self._refresh_working_days(res.calendar_id)
+        return res
+
+    def write(self, vals):
+        """Inherit Method to refresh the cached academic working days."""
+        calendars = self.mapped('calendar_id')
+        res = super(ResourceCalendarAttendance, self).write(vals)
+        self._refresh_working_days(calendars | self.mapped('calendar_id'))
+        return res
+
+    def unlink(self):
+        """Inherit Method to refresh the cached academic working days."""
+        calendars = self.mapped('calendar_id')
+        res = super(ResourceCalendarAttendance, self).unlink()
+        self._refresh_working_days(calendars)
+        return res
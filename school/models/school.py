@@ -2,8 +2,9 @@
 
 # import time
 import re
+import bisect
 import calendar
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.tools.translate import _
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
 from odoo.exceptions import UserError, ValidationError
@@ -161,6 +162,64 @@ class AcademicMonth(models.Model):
                 raise ValidationError(_('''Error! You cannot define
                     overlapping months!'''))
 
+    def write(self, vals):
+        res = super(AcademicMonth, self).write(vals)
+        if 'date_start' in vals or 'date_stop' in vals:
+            self._working_days_changed()
+        return res
+
+    def unlink(self):
+        self.clear_caches()
+        return super(AcademicMonth, self).unlink()
+
+    def _working_days_changed(self):
+        '''Hook called when the weekends or holidays of the months
+        changed: clear the cached working days so that they are computed
+        again, modules storing working days refresh them here.'''
+        if not self:
+            return True
+        self.clear_caches()
+        return True
+
+    @api.model
+    def _get_holidays(self, school_id, date_start, date_stop):
+        '''Hook returning the holidays of a school within a period.
+
+        @param school_id : id of the school, False for every school
+        @return : set of dates on which the school is closed
+        '''
+        return set()
+
+    @tools.ormcache('self.id', 'school_id')
+    def _get_working_days(self, school_id):
+        school = self.env['school.school'].sudo().browse(school_id)
+        calendar = (school.exists() and school.resource_calendar_id or
+                    self.env.company.sudo().resource_calendar_id)
+        weekdays = {int(day)
+                    for day in calendar.attendance_ids.mapped('dayofweek')}
+        holidays = self._get_holidays(school_id, self.date_start,
+                                      self.date_stop)
+        working_days = []
+        day = self.date_start
+        while day <= self.date_stop:
+            if (not weekdays or day.weekday() in weekdays) and \
+                    day not in holidays:
+                working_days.append(day)
+            day += relativedelta(days=1)
+        return tuple(working_days)
+
+    def get_working_days(self, school_id=False):
+        '''Return the working days of the month for a school.
+
+        Weekends come from the working hours of the school company and
+        holidays from _get_holidays(). The result is cached per month and
+        school until the month, the working hours or the holidays change.
+        @param school_id : id of the school, False for the current company
+        @return : tuple of dates
+        '''
+        self.ensure_one()
+        return self._get_working_days(school_id or False)
+
 
 class StandardMedium(models.Model):
     ''' Defining a medium(ENGLISH, HINDI, GUJARATI) related to standard'''
@@ -346,6 +405,13 @@ class SchoolSchool(models.Model):
                                 If not, it will be English.''')
     required_age = fields.Integer("Student Admission Age Required", default=5)
 
+    def write(self, vals):
+        res = super(SchoolSchool, self).write(vals)
+        if 'resource_calendar_id' in vals:
+            month_obj = self.env['academic.month'].sudo()
+            month_obj.search([])._working_days_changed()
+        return res
+
     @api.model
     def create(self, vals):
         res = super(SchoolSchool, self).create(vals)
@@ -616,6 +682,40 @@ class GradeMaster(models.Model):
     name = fields.Char('Grade', required=True)
     grade_ids = fields.One2many('grade.line', 'grade_id', 'Grade Lines')
 
+    @tools.ormcache('self.id')
+    def _get_grade_bands(self):
+        '''Return the grade bands of the grade system sorted on their
+        lower bound, as three tuples of lower bounds, upper bounds and
+        grade line ids'''
+        lines = self.env['grade.line'].sudo().search_read(
+            [('grade_id', '=', self.id)], ['from_mark', 'to_mark'],
+            order='from_mark, id')
+        return (tuple(line['from_mark'] for line in lines),
+                tuple(line['to_mark'] for line in lines),
+                tuple(line['id'] for line in lines))
+
+    def get_grade_line_ids(self, marks):
+        '''Grade a list of marks or percentages at once.
+
+        @param marks : list of marks or percentages
+        @return : list of the matching grade line ids, False for the
+                  marks outside of every grade band
+        '''
+        self.ensure_one()
+        from_marks, to_marks, line_ids = self._get_grade_bands()
+        res = []
+        for mark in marks:
+            index = bisect.bisect_right(from_marks, mark) - 1
+            if index >= 0 and mark <= to_marks[index]:
+                res.append(line_ids[index])
+            else:
+                res.append(False)
+        return res
+
+    def unlink(self):
+        self.clear_caches()
+        return super(GradeMaster, self).unlink()
+
 
 class GradeLine(models.Model):
     """Defining grade line."""
@@ -635,6 +735,21 @@ class GradeLine(models.Model):
     grade_id = fields.Many2one("grade.master", 'Grade Ref.')
     name = fields.Char('Name')
 
+    @api.model
+    def create(self, vals):
+        self.clear_caches()
+        return super(GradeLine, self).create(vals)
+
+    def write(self, vals):
+        res = super(GradeLine, self).write(vals)
+        if {'from_mark', 'to_mark', 'grade_id'}.intersection(vals):
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        self.clear_caches()
+        return super(GradeLine, self).unlink()
+
 
 class StudentNews(models.Model):
     """Defining studen news."""
@@ -64,3 +64,23 @@ class TestSchool(common.TransactionCase):
     def test_school(self):
         self.assertEqual(self.student_student.school_id,
                          self.student_student.standard_id.school_id)
+
+    def test_working_days(self):
+        working_days = self.academic_month.get_working_days(self.sch.id)
+        self.assertTrue(working_days)
+        for day in working_days:
+            self.assertTrue(self.academic_month.date_start <= day <=
+                            self.academic_month.date_stop)
+        self.assertEqual(working_days,
+                         self.academic_month.get_working_days(self.sch.id))
+
+    def test_grade_bands(self):
+        grade_system = self.env.ref('school.demo_student_grade_1')
+        grade_a = self.env.ref('school.demo_student_grade_line_2')
+        grade_f = self.env.ref('school.demo_student_grade_line_7')
+        self.assertEqual(grade_system.get_grade_line_ids([85, 0, 120]),
+                         [grade_a.id, grade_f.id, False])
+        grade_a.write({'to_mark': 95})
+        grade_a.grade_id.grade_ids.filtered(
+            lambda line: line.from_mark == 90).write({'from_mark': 96})
+        self.assertEqual(grade_system.get_grade_line_ids([92]), [grade_a.id])
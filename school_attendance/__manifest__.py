@@ -2,7 +2,7 @@
 
 {
     'name': 'Attendance Management',
-    'version': "13.0.1.0.0",
+    'version': "13.0.1.1.0",
     'author': 'Serpent Consulting Services Pvt. Ltd.',
     'website': 'http://www.serpentcs.com',
     'images': ['static/description/SchoolAttendance.png'],
@@ -10,14 +10,15 @@
     'license': "AGPL-3",
     'summary': 'A Module For Attendance Management In School',
     'complexity': 'easy',
-    'depends': ['school', 'hr'],
+    'depends': ['school', 'hr', 'timetable'],
     'data': ['security/attendance_security.xml',
              'security/ir.model.access.csv',
              'views/school_attendance_view.xml',
              'views/month_attendance.xml',
              'views/report_view.xml',
              'wizard/attendance_sheet_wizard_view.xml',
-             'wizard/student_attendance_by_month_view.xml'],
+             'wizard/student_attendance_by_month_view.xml',
+             'wizard/lecture_attendance_generate_view.xml'],
     'demo': ['demo/school_attendance_demo.xml'],
     'installable': True,
     'application': True
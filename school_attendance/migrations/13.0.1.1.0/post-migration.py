@@ -0,0 +1,25 @@
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import api, SUPERUSER_ID
+from odoo.addons.school_attendance.models.school_attendance import DAY_FIELDS
+
+
+def migrate(cr, version):
+    '''Fold the legacy per-day boolean columns into ``day_mask`` and
+    recompute the attendance percentages from it.'''
+    if not version:
+        return
+    cr.execute("""SELECT column_name FROM information_schema.columns
+                  WHERE table_name = 'attendance_sheet_line'
+                  AND column_name IN %s""", (DAY_FIELDS,))
+    columns = {row[0] for row in cr.fetchall()}
+    terms = ["(CASE WHEN %s THEN %d ELSE 0 END)" % (name, 1 << day)
+             for day, name in enumerate(DAY_FIELDS) if name in columns]
+    if terms:
+        cr.execute("UPDATE attendance_sheet_line SET day_mask = " +
+                   " | ".join(terms))
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    lines = env['attendance.sheet.line'].search([])
+    lines.invalidate_cache(['day_mask'], lines.ids)
+    env.add_to_compute(lines._fields['percentage'], lines)
+    lines.recompute()
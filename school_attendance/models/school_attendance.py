@@ -1,16 +1,110 @@
 # See LICENSE file for full copyright and licensing details.
 
 import time
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import Warning as UserError
 from datetime import datetime, date
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
 from dateutil.relativedelta import relativedelta as rd
 from odoo.exceptions import ValidationError
 from lxml import etree
+import copy
+import csv
+import io
 import json
 
 
+# Legacy per-day columns of the monthly sheet, index 0 holding day 1.
+DAY_FIELDS = ('one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
+              'nine', 'ten', 'one_1', 'one_2', 'one_3', 'one_4', 'one_5',
+              'one_6', 'one_7', 'one_8', 'one_9', 'one_0', 'two_1', 'two_2',
+              'two_3', 'two_4', 'two_5', 'two_6', 'two_7', 'two_8', 'two_9',
+              'two_0', 'three_1')
+
+# Number of lectures a day that fit in the lecture attendance mask.
+MAX_PERIODS = 31
+
+
+def day_bit(day):
+    """Return the bit of the monthly attendance mask storing ``day``."""
+    if not 1 <= day <= 31:
+        raise ValidationError(_('Invalid day of month %s!') % day)
+    return 1 << (day - 1)
+
+
+def count_days(mask):
+    """Return the number of days set in a monthly attendance mask."""
+    return bin(mask or 0).count('1')
+
+
+def update_bitmasks(records, field_name, updates):
+    """Set and clear bits of an integer mask field with a single UPDATE.
+
+    @param records : empty recordset of the model to update
+    @param updates : dictionary mapping a record id to a
+                     ``(set_bits, clear_bits)`` pair
+    """
+    if not updates:
+        return
+    records.flush([field_name])
+    values = [(rec_id, bits[0], bits[1]) for rec_id, bits in updates.items()]
+    query = """
+        UPDATE %s AS rec
+        SET %s = (COALESCE(rec.%s, 0) | val.set_bits) & ~val.clear_bits
+        FROM (VALUES %s) AS val(id, set_bits, clear_bits)
+        WHERE rec.id = val.id""" % (records._table, field_name, field_name,
+                                    ', '.join(['%s'] * len(values)))
+    records._cr.execute(query, values)
+    records = records.browse(list(updates))
+    records.invalidate_cache([field_name], records.ids)
+    records.modified([field_name])
+
+
+def period_bit(sequence):
+    """Return the bit of the lecture attendance mask storing a period."""
+    if not 1 <= sequence <= MAX_PERIODS:
+        raise ValidationError(_('Invalid period %s!') % sequence)
+    return 1 << (sequence - 1)
+
+
+# Status values accepted by the bulk attendance import.
+PRESENT_VALUES = ('1', 'p', 'present', 'true', 'yes', 'y', 'in')
+ABSENT_VALUES = ('0', 'a', 'absent', 'false', 'no', 'n', 'out')
+
+
+def presence_value(value):
+    """Return True for a present status, False for an absent one and None
+    when the status is not understood."""
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in PRESENT_VALUES:
+        return True
+    if value in ABSENT_VALUES:
+        return False
+    return None
+
+
+class AcademicMonth(models.Model):
+    _inherit = 'academic.month'
+
+    def _working_days_changed(self):
+        '''Override method to recompute the working days stored on the
+        attendance sheets and summaries of the months, and the attendance
+        percentages depending on them.'''
+        res = super(AcademicMonth, self)._working_days_changed()
+        if self:
+            sheet_obj = self.env['attendance.sheet'].sudo()
+            sheets = sheet_obj.search([('month_id', 'in', self.ids)])
+            for field_name in ('working_mask', 'working_days'):
+                self.env.add_to_compute(sheet_obj._fields[field_name], sheets)
+            sheets.modified(['working_mask', 'working_days'])
+            sheet_obj.recompute()
+            self.env['attendance.summary'].sudo().search(
+                [('month_id', 'in', self.ids)])._update_working_days()
+        return res
+
+
 class AttendanceSheet(models.Model):
     '''Defining Monthly Attendance sheet Information.'''
 
@@ -31,6 +125,27 @@ class AttendanceSheet(models.Model):
                               help="Select Teacher")
     attendance_type = fields.Selection([('daily', 'FullDay'),
                                         ('lecture', 'Lecture Wise')], 'Type')
+    working_mask = fields.Integer(compute="_compute_working_days",
+                                  store=True,
+                                  help="Bit n-1 is set when day n of the "
+                                       "month is a working day")
+    working_days = fields.Integer('Working Days',
+                                  compute="_compute_working_days",
+                                  store=True,
+                                  help="Working days of the month")
+
+    @api.depends('month_id', 'month_id.date_start', 'month_id.date_stop',
+                 'standard_id.school_id')
+    def _compute_working_days(self):
+        '''Method to get the working days of the sheet month.'''
+        for rec in self:
+            mask = 0
+            if rec.month_id:
+                for day in rec.month_id.get_working_days(
+                        rec.standard_id.school_id.id):
+                    mask |= day_bit(day.day)
+            rec.working_mask = mask
+            rec.working_days = count_days(mask)
 
     @api.onchange('standard_id')
     def onchange_class_info(self):
@@ -50,58 +165,46 @@ class AttendanceSheet(models.Model):
     def fields_view_get(self, view_id=None,
                         view_type='form',
                         toolbar=False, submenu=False):
+        start = self._context.get('start_date')
+        end = self._context.get('end_date')
+        if view_type != 'form' or not start or not end:
+            return super(AttendanceSheet, self).fields_view_get(
+                view_id=view_id, view_type=view_type, toolbar=toolbar,
+                submenu=submenu)
+        st_dates = datetime.strptime(str(start), DEFAULT_SERVER_DATE_FORMAT)
+        end_dates = datetime.strptime(str(end), DEFAULT_SERVER_DATE_FORMAT)
+        day_labels = []
+        while st_dates <= end_dates and len(day_labels) < len(DAY_FIELDS):
+            day_labels.append(st_dates.day)
+            st_dates += rd(days=1)
+        res = self._month_fields_view_get(view_id, toolbar, submenu,
+                                          tuple(day_labels))
+        return copy.deepcopy(res)
+
+    @tools.ormcache('self.env.uid', 'self.env.lang', 'view_id', 'toolbar',
+                    'submenu', 'day_labels')
+    def _month_fields_view_get(self, view_id, toolbar, submenu, day_labels):
+        '''Return the form view with the day columns labelled for a month.
+
+        The rewritten view only depends on the day numbers shown, so it
+        is cached on those. Updating a view clears the ormcache and the
+        rewritten views with it.
+        '''
         res = super(AttendanceSheet, self).fields_view_get(view_id=view_id,
-                                                           view_type=view_type,
+                                                           view_type='form',
                                                            toolbar=toolbar,
                                                            submenu=submenu)
-        start = self._context.get('start_date')
-        end = self._context.get('end_date')
-        st_dates = end_dates = False
-        if start:
-            st_dates = datetime.strptime(start,
-                                         DEFAULT_SERVER_DATE_FORMAT)
-        if end:
-            end_dates = datetime.strptime(end,
-                                          DEFAULT_SERVER_DATE_FORMAT)
-        if view_type == 'form':
-            digits_temp_dict = {1: 'one', 2: 'two', 3: 'three', 4: 'four',
-                                5: 'five', 6: 'six', 7: 'seven', 8: 'eight',
-                                9: 'nine', 10: 'ten', 11: 'one_1', 12: 'one_2',
-                                13: 'one_3', 14: 'one_4', 15: 'one_5',
-                                16: 'one_6', 17: 'one_7', 18: 'one_8',
-                                19: 'one_9', 20: 'one_0',
-                                21: 'two_1', 22: 'two_2', 23: 'two_3',
-                                24: 'two_4', 25: 'two_5',
-                                26: 'two_6', 27: 'two_7', 28: 'two_8',
-                                29: 'two_9', 30: 'two_0',
-                                31: 'three_1'}
-            flag = 1
-            if st_dates and end_dates:
-                while st_dates <= end_dates:
-                    res['fields']['attendance_ids'
-                                  ]['views'
-                                    ]['tree'
-                                      ]['fields'
-                                        ][digits_temp_dict.get(flag)
-                                          ]['string'
-                                            ] = st_dates.day
-                    st_dates += rd(days=1)
-                    flag += 1
-            if flag < 32:
-                res['fields']['attendance_ids'
-                              ]['views']['tree'
-                                         ]['fields'
-                                           ][digits_temp_dict.get(flag)
-                                             ]['string'] = ''
-                doc2 = etree.XML(res['fields']['attendance_ids']['views'
-                                                                 ]['tree'
-                                                                   ]['arch'])
-                nodes = doc2.xpath("//field[@name='" +
-                                   digits_temp_dict.get(flag) + "']")
-                for node in nodes:
+        tree_view = res['fields']['attendance_ids']['views']['tree']
+        length = len(day_labels)
+        for field_name, label in zip(DAY_FIELDS, day_labels):
+            tree_view['fields'][field_name]['string'] = label
+        if length < len(DAY_FIELDS):
+            doc2 = etree.XML(tree_view['arch'])
+            for field_name in DAY_FIELDS[length:]:
+                tree_view['fields'][field_name]['string'] = ''
+                for node in doc2.xpath("//field[@name='%s']" % field_name):
                     node.set('modifiers', json.dumps({'invisible': True}))
-                res['fields']['attendance_ids'
-                              ]['views']['tree']['arch'] = etree.tostring(doc2)
+            tree_view['arch'] = etree.tostring(doc2)
         return res
 
 
@@ -195,6 +298,31 @@ class StudentleaveRequest(models.Model):
                                                                  self._name
                                                                  )])
 
+    @api.model
+    def get_students_on_leave(self, standard_ids, date_from, date_to=None):
+        '''Return the ids of the students on approved leave.
+
+        @param standard_ids : id or list of ids of the classes to look at
+        @param date_from : first day of the period
+        @param date_to : last day of the period, date_from when not given
+        @return : set of ids of the students having an approved leave
+                  overlapping the period
+        '''
+        if isinstance(standard_ids, int):
+            standard_ids = [standard_ids]
+        if not standard_ids or not date_from:
+            return set()
+        self.flush(['state', 'student_id', 'standard_id', 'start_date',
+                    'end_date'])
+        self._cr.execute("""
+            SELECT DISTINCT student_id FROM studentleave_request
+            WHERE state = 'approve'
+            AND standard_id IN %s
+            AND start_date <= %s
+            AND end_date >= %s""", (tuple(standard_ids),
+                                    date_to or date_from, date_from))
+        return {row[0] for row in self._cr.fetchall()}
+
     @api.constrains('student_id', 'start_date', 'end_date')
     def check_student_request(self):
         leave_request = self.search([('student_id', '=', self.student_id.id),
@@ -220,122 +348,140 @@ greater than current date!"))
 class AttendanceSheetLine(models.Model):
     '''Defining Attendance Sheet Line Information.'''
 
-    def _compute_percentage(self):
-        '''Method to get attendance percent.'''
-
-        res = {}
-        for attendance_sheet_data in self:
-            att_count = 0
-            percentage = 0.0
-            if attendance_sheet_data.one:
-                att_count = att_count + 1
-            if attendance_sheet_data.two:
-                att_count = att_count + 1
-            if attendance_sheet_data.three:
-                att_count = att_count + 1
-            if attendance_sheet_data.four:
-                att_count = att_count + 1
-            if attendance_sheet_data.five:
-                att_count = att_count + 1
-            if attendance_sheet_data.six:
-                att_count = att_count + 1
-            if attendance_sheet_data.seven:
-                att_count = att_count + 1
-            if attendance_sheet_data.eight:
-                att_count = att_count + 1
-            if attendance_sheet_data.nine:
-                att_count = att_count + 1
-            if attendance_sheet_data.ten:
-                att_count = att_count + 1
-
-            if attendance_sheet_data.one_1:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_2:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_3:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_4:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_5:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_6:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_7:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_8:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_9:
-                att_count = att_count + 1
-            if attendance_sheet_data.one_0:
-                att_count = att_count + 1
-
-            if attendance_sheet_data.two_1:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_2:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_3:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_4:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_5:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_6:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_7:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_8:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_9:
-                att_count = att_count + 1
-            if attendance_sheet_data.two_0:
-                att_count = att_count + 1
-            if attendance_sheet_data.three_1:
-                att_count = att_count + 1
-            percentage = (float(att_count / 31.00)) * 100
-            attendance_sheet_data.percentage = percentage
-        return res
-
     _description = 'Attendance Sheet Line'
     _name = 'attendance.sheet.line'
     _order = 'roll_no'
 
+    @api.depends('day_mask', 'standard_id.working_mask')
+    def _compute_percentage(self):
+        '''Method to get attendance percent over the working days.'''
+        for rec in self:
+            working_mask = rec.standard_id.working_mask
+            working_days = count_days(working_mask)
+            rec.percentage = working_days and (
+                count_days(rec.day_mask & working_mask) /
+                float(working_days)) * 100 or 0.0
+
+    @api.depends('day_mask')
+    def _compute_day_fields(self):
+        '''Expose the bitmask through the legacy per-day columns.'''
+        for rec in self:
+            for day, field_name in enumerate(DAY_FIELDS, 1):
+                rec[field_name] = bool(rec.day_mask & day_bit(day))
+
+    def _inverse_day_fields(self):
+        '''Fold the legacy per-day columns back into the bitmask.'''
+        for rec in self:
+            mask = 0
+            for day, field_name in enumerate(DAY_FIELDS, 1):
+                if rec[field_name]:
+                    mask |= day_bit(day)
+            rec.day_mask = mask
+
+    def set_day(self, day):
+        '''Mark the students present on the given day of the month.'''
+        bit = day_bit(day)
+        self.update_day_masks({rec.id: (bit, 0) for rec in self})
+        return True
+
+    def clear_day(self, day):
+        '''Mark the students absent on the given day of the month.'''
+        bit = day_bit(day)
+        self.update_day_masks({rec.id: (0, bit) for rec in self})
+        return True
+
+    @api.model
+    def update_day_masks(self, updates):
+        '''Apply day bits to many sheet lines in a single UPDATE.
+
+        @param updates : dictionary mapping a sheet line id to a
+                         ``(set_bits, clear_bits)`` pair
+        '''
+        update_bitmasks(self, 'day_mask', updates)
+        return True
+
+    def mark_day(self, day, present):
+        '''Set or clear the given day depending on ``present``.'''
+        if present:
+            return self.set_day(day)
+        return self.clear_day(day)
+
+    def days_present(self):
+        '''Return the number of days present for each line, keyed by id.'''
+        return {rec.id: count_days(rec.day_mask) for rec in self}
+
     roll_no = fields.Integer('Roll Number', required=True,
                              help='Roll Number of Student')
     standard_id = fields.Many2one('attendance.sheet', 'Standard')
     name = fields.Char('Student Name', required=True, readonly=True)
-    one = fields.Boolean('1')
-    two = fields.Boolean('2')
-    three = fields.Boolean('3')
-    four = fields.Boolean('4')
-    five = fields.Boolean('5')
-    seven = fields.Boolean('7')
-    six = fields.Boolean('6')
-    eight = fields.Boolean('8')
-    nine = fields.Boolean('9')
-    ten = fields.Boolean('10')
-    one_1 = fields.Boolean('11')
-    one_2 = fields.Boolean('12')
-    one_3 = fields.Boolean('13')
-    one_4 = fields.Boolean('14')
-    one_5 = fields.Boolean('15')
-    one_6 = fields.Boolean('16')
-    one_7 = fields.Boolean('17')
-    one_8 = fields.Boolean('18')
-    one_9 = fields.Boolean('19')
-    one_0 = fields.Boolean('20')
-    two_1 = fields.Boolean('21')
-    two_2 = fields.Boolean('22')
-    two_3 = fields.Boolean('23')
-    two_4 = fields.Boolean('24')
-    two_5 = fields.Boolean('25')
-    two_6 = fields.Boolean('26')
-    two_7 = fields.Boolean('27')
-    two_8 = fields.Boolean('28')
-    two_9 = fields.Boolean('29')
-    two_0 = fields.Boolean('30')
-    three_1 = fields.Boolean('31')
-    percentage = fields.Float(compute="_compute_percentage", method=True,
-                              string='Attendance (%)', store=False)
+    day_mask = fields.Integer('Attendance Days', default=0,
+                              help="Bit n-1 is set when the student was "
+                                   "present on day n of the month")
+    one = fields.Boolean('1', compute='_compute_day_fields',
+                         inverse='_inverse_day_fields')
+    two = fields.Boolean('2', compute='_compute_day_fields',
+                         inverse='_inverse_day_fields')
+    three = fields.Boolean('3', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    four = fields.Boolean('4', compute='_compute_day_fields',
+                          inverse='_inverse_day_fields')
+    five = fields.Boolean('5', compute='_compute_day_fields',
+                          inverse='_inverse_day_fields')
+    six = fields.Boolean('6', compute='_compute_day_fields',
+                         inverse='_inverse_day_fields')
+    seven = fields.Boolean('7', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    eight = fields.Boolean('8', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    nine = fields.Boolean('9', compute='_compute_day_fields',
+                          inverse='_inverse_day_fields')
+    ten = fields.Boolean('10', compute='_compute_day_fields',
+                         inverse='_inverse_day_fields')
+    one_1 = fields.Boolean('11', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_2 = fields.Boolean('12', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_3 = fields.Boolean('13', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_4 = fields.Boolean('14', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_5 = fields.Boolean('15', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_6 = fields.Boolean('16', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_7 = fields.Boolean('17', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_8 = fields.Boolean('18', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_9 = fields.Boolean('19', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    one_0 = fields.Boolean('20', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_1 = fields.Boolean('21', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_2 = fields.Boolean('22', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_3 = fields.Boolean('23', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_4 = fields.Boolean('24', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_5 = fields.Boolean('25', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_6 = fields.Boolean('26', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_7 = fields.Boolean('27', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_8 = fields.Boolean('28', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_9 = fields.Boolean('29', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    two_0 = fields.Boolean('30', compute='_compute_day_fields',
+                           inverse='_inverse_day_fields')
+    three_1 = fields.Boolean('31', compute='_compute_day_fields',
+                             inverse='_inverse_day_fields')
+    percentage = fields.Float(compute="_compute_percentage",
+                              string='Attendance (%)', store=True,
+                              group_operator='avg')
 
 
 class DailyAttendance(models.Model):
@@ -357,7 +503,7 @@ class DailyAttendance(models.Model):
         if self.user_id:
             self.standard_id = False
 
-    @api.depends('student_ids')
+    @api.depends('student_ids.is_present')
     def _compute_present(self):
         '''Method to count present students.'''
         for rec in self:
@@ -367,16 +513,15 @@ class DailyAttendance(models.Model):
                     count += 1
             rec.total_presence = count
 
-    @api.depends('student_ids')
+    @api.depends('student_ids.is_absent')
     def _compute_absent(self):
         '''Method to count absent students'''
         for rec in self:
             count_fail = 0
-            if rec.student_ids:
-                for att in rec.student_ids:
-                    if att.is_absent:
-                        count_fail += 1
-                rec.total_absent = count_fail
+            for att in rec.student_ids:
+                if att.is_absent:
+                    count_fail += 1
+            rec.total_absent = count_fail
 
     @api.constrains('date')
     def validate_date(self):
@@ -425,19 +570,10 @@ class DailyAttendance(models.Model):
                 stud_ids = stud_obj.search([('standard_id', '=',
                                              rec.standard_id.id),
                                             ('state', '=', 'done')])
+                leave_obj = self.env['studentleave.request']
+                on_leave = leave_obj.get_students_on_leave(rec.standard_id.id,
+                                                           rec.date)
                 for stud in stud_ids:
-                    student_leave = self.env['studentleave.request'
-                                             ].search([('state', '=',
-                                                        'approve'),
-                                                       ('student_id', '=',
-                                                        stud.id),
-                                                       ('standard_id', '=',
-                                                        rec.standard_id.id),
-                                                       ('start_date', '<=',
-                                                        rec.date),
-                                                       ('end_date', '>=',
-                                                        rec.date)
-                                                       ])
                     stud_vals_abs = (0, 0, {'roll_no': stud.roll_no,
                                             'stud_id': stud.id,
                                             'is_absent': True
@@ -446,8 +582,7 @@ class DailyAttendance(models.Model):
                                         'stud_id': stud.id,
                                         'is_present': True
                                         })
-                    if student_leave:
-
+                    if stud.id in on_leave:
                         student_list.append(stud_vals_abs)
                     else:
                         student_list.append(stud_vals)
@@ -458,551 +593,399 @@ class DailyAttendance(models.Model):
     def create(self, vals):
         student_list = []
         stud_obj = self.env['student.student']
-        standard_id = vals.get('student_id')
-        date = vals.get('date')
-        stud_ids = stud_obj.search([('standard_id', '=',
-                                     vals.get('standard_id')),
+        standard_id = vals.get('standard_id')
+        stud_ids = stud_obj.search([('standard_id', '=', standard_id),
                                     ('state', '=', 'done')])
+        on_leave = set()
+        # Sheets created from scanned events start with every student
+        # absent, the scanned students being marked present afterwards.
+        absent = self._context.get('absent_by_default')
+        if not absent and vals.get('student_ids') and not vals.get(
+                'student_ids')[0][2].get('present_absentcheck'):
+            on_leave = self.env['studentleave.request'
+                                ].get_students_on_leave(standard_id,
+                                                        vals.get('date'))
         for stud in stud_ids:
             line_vals = {'roll_no': stud.roll_no,
                          'stud_id': stud.id,
                          'is_present': True
                          }
-            if vals.get('student_ids') and not vals.get(
-                    'student_ids')[0][2].get('present_absentcheck'):
-                student_leave = self.env['studentleave.request'
-                                         ].search([('state', '=',
-                                                    'approve'),
-                                                   ('student_id', '=',
-                                                    stud.id),
-                                                   ('standard_id', '=',
-                                                    standard_id),
-                                                   ('start_date', '<=',
-                                                    date),
-                                                   ('end_date', '>=',
-                                                    date)
-                                                   ])
-                if student_leave:
-                    line_vals.update({'is_absent': True})
+            if absent or stud.id in on_leave:
+                line_vals.update({'is_present': False, 'is_absent': True})
             student_list.append((0, 0, line_vals))
         vals.update({'student_ids': student_list})
         return super(DailyAttendance, self).create(vals)
 
-    def attendance_draft(self):
-        '''Change the state of attendance to draft'''
-        att_sheet_obj = self.env['attendance.sheet']
-        academic_year_obj = self.env['academic.year']
-        academic_month_obj = self.env['academic.month']
+    def _get_academic_months(self):
+        '''Return a dictionary mapping the id of each daily sheet to the
+        academic month of its date, read with a single search.'''
+        records = self.filtered('date')
+        if not records:
+            return {}
+        months = self.env['academic.month'].search(
+            [('date_start', '<=', max(records.mapped('date'))),
+             ('date_stop', '>=', min(records.mapped('date')))])
+        res = {}
+        for rec in records:
+            for month in months:
+                if month.date_start <= rec.date <= month.date_stop:
+                    res[rec.id] = month
+                    break
+        return res
 
+    def attendance_draft(self):
+        '''Change the state of attendance to draft.
+
+        Works on any number of daily sheets at once: the day of every
+        daily sheet is cleared on all lines of its monthly sheet with
+        one UPDATE.
+        '''
+        if self.filtered(lambda rec: not rec.date):
+            raise UserError(_('Please enter todays date.'))
+        sheet_line_obj = self.env['attendance.sheet.line']
+        self.env['attendance.summary'].add_daily_attendance(
+            self.filtered(lambda rec: rec.state == 'validate'), sign=-1)
+        month_map = self._get_academic_months()
+        days = {}
         for rec in self:
-            if not rec.date:
-                raise UserError(_('Please enter todays date.'))
-            year_search_ids = academic_year_obj.search([('code', '=',
-                                                         rec.date.year)])
-            month_search_ids = academic_month_obj.search([('code', '=',
-                                                           rec.date.month)])
-            sheet_ids = att_sheet_obj.search(
-                [('standard_id', '=', rec.standard_id.id),
-                 ('month_id', '=', month_search_ids.id),
-                 ('year_id', '=', year_search_ids.id)])
-            if sheet_ids:
-                for data in sheet_ids:
-                    for attendance_id in data.attendance_ids:
-                        date = rec.date
-                        if date.day == 1:
-                            dic = {'one': False}
-                        elif date.day == 2:
-                            dic = {'two': False}
-                        elif date.day == 3:
-                            dic = {'three': False}
-                        elif date.day == 4:
-                            dic = {'four': False}
-                        elif date.day == 5:
-                            dic = {'five': False}
-                        elif date.day == 6:
-                            dic = {'six': False}
-                        elif date.day == 7:
-                            dic = {'seven': False}
-                        elif date.day == 8:
-                            dic = {'eight': False}
-                        elif date.day == 9:
-                            dic = {'nine': False}
-                        elif date.day == 10:
-                            dic = {'ten': False}
-                        elif date.day == 11:
-                            dic = {'one_1': False}
-                        elif date.day == 12:
-                            dic = {'one_2': False}
-                        elif date.day == 13:
-                            dic = {'one_3': False}
-                        elif date.day == 14:
-                            dic = {'one_4': False}
-                        elif date.day == 15:
-                            dic = {'one_5': False}
-                        elif date.day == 16:
-                            dic = {'one_6': False}
-                        elif date.day == 17:
-                            dic = {'one_7': False}
-                        elif date.day == 18:
-                            dic = {'one_8': False}
-                        elif date.day == 19:
-                            dic = {'one_9': False}
-                        elif date.day == 20:
-                            dic = {'one_0': False}
-                        elif date.day == 21:
-                            dic = {'two_1': False}
-                        elif date.day == 22:
-                            dic = {'two_2': False}
-                        elif date.day == 23:
-                            dic = {'two_3': False}
-                        elif date.day == 24:
-                            dic = {'two_4': False}
-                        elif date.day == 25:
-                            dic = {'two_5': False}
-                        elif date.day == 26:
-                            dic = {'two_6': False}
-                        elif date.day == 27:
-                            dic = {'two_7': False}
-                        elif date.day == 28:
-                            dic = {'two_8': False}
-                        elif date.day == 29:
-                            dic = {'two_9': False}
-                        elif date.day == 30:
-                            dic = {'two_0': False}
-                        elif date.day == 31:
-                            dic = {'three_1': False}
-                        attendance_id.write(dic)
-            rec.state = 'draft'
+            month = month_map.get(rec.id)
+            if month:
+                key = (rec.standard_id.id, month.id)
+                days[key] = days.get(key, 0) | day_bit(rec.date.day)
+        if days:
+            sheets = self.env['attendance.sheet'].search(
+                [('standard_id', 'in', list({key[0] for key in days})),
+                 ('month_id', 'in', list({key[1] for key in days}))])
+            sheet_days = {}
+            for sheet in sheets:
+                bits = days.get((sheet.standard_id.id, sheet.month_id.id))
+                if bits:
+                    sheet_days[sheet.id] = bits
+            updates = {}
+            for sheet_line in sheet_line_obj.search_read(
+                    [('standard_id', 'in', list(sheet_days))],
+                    ['standard_id']):
+                updates[sheet_line['id']] = (
+                    0, sheet_days[sheet_line['standard_id'][0]])
+            sheet_line_obj.update_day_masks(updates)
+        self.write({'state': 'draft'})
         return True
 
+    @api.model
+    def revert_attendance_date(self, att_date, standard_ids=None):
+        '''Set back to draft every validated daily sheet of a day.
+
+        @param att_date : date of the daily sheets
+        @param standard_ids : ids of the classes, all classes when not given
+        @return : recordset of the reverted daily sheets
+        '''
+        domain = [('date', '=', att_date), ('state', '=', 'validate')]
+        if standard_ids:
+            domain.append(('standard_id', 'in', standard_ids))
+        records = self.search(domain)
+        records.attendance_draft()
+        return records
+
     def attendance_validate(self):
-        '''Method to validate attendance.'''
+        '''Method to validate attendance.
+
+        Works on any number of daily sheets at once: the monthly sheets
+        and their lines are resolved with a handful of queries and the
+        day of every student is written with one UPDATE.
+        '''
         sheet_line_obj = self.env['attendance.sheet.line']
-        acadmic_year_obj = self.env['academic.year']
-        acadmic_month_obj = self.env['academic.month']
         attendance_sheet_obj = self.env['attendance.sheet']
+        summary_obj = self.env['attendance.summary']
+        to_count = self.filtered(lambda rec: rec.state != 'validate')
+        records = self.filtered('date')
+        if not records:
+            self.write({'state': 'validate'})
+            summary_obj.add_daily_attendance(to_count)
+            return True
+        month_map = records._get_academic_months()
+
+        # Resolve the monthly sheet of every daily sheet, creating the
+        # missing ones in a single call.
+        sheet_keys = {}
+        for rec in records:
+            month = month_map.get(rec.id)
+            if month:
+                sheet_keys.setdefault((rec.standard_id.id, month.id),
+                                      (rec, month))
+        sheets = {}
+        if sheet_keys:
+            for sheet in attendance_sheet_obj.search(
+                    [('standard_id', 'in',
+                      list({key[0] for key in sheet_keys})),
+                     ('month_id', 'in',
+                      list({key[1] for key in sheet_keys}))]):
+                sheets.setdefault((sheet.standard_id.id, sheet.month_id.id),
+                                  sheet)
+        missing = [key for key in sheet_keys if key not in sheets]
+        new_sheets = attendance_sheet_obj.create([
+            {'name': sheet_keys[key][1].name + '-' +
+             str(sheet_keys[key][0].date.year),
+             'standard_id': key[0],
+             'user_id': sheet_keys[key][0].user_id.id,
+             'month_id': key[1],
+             'year_id': sheet_keys[key][1].year_id.id}
+            for key in missing])
+        sheets.update(zip(missing, new_sheets))
+
+        # Fetch every sheet line of those sheets once, keyed by roll no.
+        sheet_lines = {}
+        for sheet_line in sheet_line_obj.search_read(
+                [('standard_id', 'in',
+                  [sheet.id for sheet in sheets.values()])],
+                ['roll_no', 'standard_id']):
+            sheet_lines[(sheet_line['standard_id'][0],
+                         sheet_line['roll_no'])] = sheet_line['id']
+
+        day_lines = []
+        new_lines = {}
+        for student in records.mapped('student_ids'):
+            rec = student.standard_id
+            month = month_map.get(rec.id)
+            if not month:
+                continue
+            sheet = sheets[(rec.standard_id.id, month.id)]
+            key = (sheet.id, student.roll_no)
+            day_lines.append((key, rec.date.day, student.is_absent))
+            if key not in sheet_lines and key not in new_lines:
+                new_lines[key] = {'roll_no': student.roll_no,
+                                  'standard_id': sheet.id,
+                                  'name': student.stud_id.student_name}
+        created = sheet_line_obj.create(list(new_lines.values()))
+        sheet_lines.update(zip(new_lines, created.ids))
+
+        updates = {}
+        for key, day, is_absent in day_lines:
+            bit = day_bit(day)
+            set_bits, clear_bits = updates.get(sheet_lines[key], (0, 0))
+            if is_absent:
+                set_bits, clear_bits = set_bits & ~bit, clear_bits | bit
+            else:
+                set_bits, clear_bits = set_bits | bit, clear_bits & ~bit
+            updates[sheet_lines[key]] = (set_bits, clear_bits)
+        sheet_line_obj.update_day_masks(updates)
+        self.write({'state': 'validate'})
+        summary_obj.add_daily_attendance(to_count)
+        return True
 
-        for line in self:
-            year_ids = acadmic_year_obj.search(
-                [('date_start', '<=', line.date),
-                 ('date_stop', '>=', line.date)])
-            month_ids = acadmic_month_obj.search(
-                [('date_start', '<=', line.date),
-                 ('date_stop', '>=', line.date),
-                 ('year_id', 'in', year_ids.ids)])
-            if month_ids:
-                month_data = month_ids
-                att_sheet_ids = attendance_sheet_obj.search([('month_id', 'in',
-                                                              month_ids.ids),
-                                                             ('year_id', 'in',
-                                                              year_ids.ids)])
-                attendance_sheet_id = (att_sheet_ids and att_sheet_ids[0] or
-                                       False)
-                date = line.date
-                if not attendance_sheet_id:
-                    sheet = {'name': (month_data.name + '-' +
-                                      str(line.date.year)),
-                             'standard_id': line.standard_id.id,
-                             'user_id': line.user_id.id,
-                             'month_id': month_data.id,
-                             'year_id': year_ids and year_ids.id or False}
-                    attendance_sheet_id = attendance_sheet_obj.create(sheet)
-                    for student_id in line.student_ids:
-                        line_dict = {'roll_no': student_id.roll_no,
-                                     'standard_id': attendance_sheet_id.id,
-                                     'name': student_id.stud_id.student_name}
-                        sheet_line_obj.create(line_dict)
-                        for student_id in line.student_ids:
-                            search_id = sheet_line_obj.\
-                                search([('roll_no', '=', student_id.roll_no)])
-                            # compute attendance of each day
-                            if date.day == 1 and student_id.is_absent:
-                                val = {'one': False}
-
-                            elif date.day == 1 and not student_id.is_absent:
-                                val = {'one': True}
-
-                            elif date.day == 2 and student_id.is_absent:
-                                val = {'two': False}
-
-                            elif date.day == 2 and not student_id.is_absent:
-                                val = {'two': True}
-
-                            elif date.day == 3 and student_id.is_absent:
-                                val = {'three': False}
-
-                            elif date.day == 3 and not student_id.is_absent:
-                                val = {'three': True}
-
-                            elif date.day == 4 and student_id.is_absent:
-                                val = {'four': False}
-
-                            elif date.day == 4 and not student_id.is_absent:
-                                val = {'four': True}
-
-                            elif date.day == 5 and student_id.is_absent:
-                                val = {'five': False}
-
-                            elif date.day == 5 and not student_id.is_absent:
-                                val = {'five': True}
-
-                            elif date.day == 6 and student_id.is_absent:
-                                val = {'six': False}
-
-                            elif date.day == 6 and not student_id.is_absent:
-                                val = {'six': True}
-
-                            elif date.day == 7 and student_id.is_absent:
-                                val = {'seven': False}
-
-                            elif date.day == 7 and not student_id.is_absent:
-                                val = {'seven': True}
-
-                            elif date.day == 8 and student_id.is_absent:
-                                val = {'eight': False}
-
-                            elif date.day == 8 and not student_id.is_absent:
-                                val = {'eight': True}
-
-                            elif date.day == 9 and student_id.is_absent:
-                                val = {'nine': False}
-
-                            elif date.day == 9 and not student_id.is_absent:
-                                val = {'nine': True}
-
-                            elif date.day == 10 and student_id.is_absent:
-                                val = {'ten': False}
-
-                            elif date.day == 10 and not student_id.is_absent:
-                                val = {'ten': True}
-
-                            elif date.day == 11 and student_id.is_absent:
-                                val = {'one_1': False}
-
-                            elif date.day == 11 and not student_id.is_absent:
-                                val = {'one_1': True}
-
-                            elif date.day == 12 and student_id.is_absent:
-                                val = {'one_2': False}
-
-                            elif date.day == 12 and not student_id.is_absent:
-                                val = {'one_2': True}
-
-                            elif date.day == 13 and student_id.is_absent:
-                                val = {'one_3': False}
-
-                            elif date.day == 13 and not student_id.is_absent:
-                                val = {'one_3': True}
-
-                            elif date.day == 14 and student_id.is_absent:
-                                val = {'one_4': False}
-
-                            elif date.day == 14 and not student_id.is_absent:
-                                val = {'one_4': True}
-
-                            elif date.day == 15 and student_id.is_absent:
-                                val = {'one_5': False}
-
-                            elif date.day == 15 and not student_id.is_absent:
-                                val = {'one_5': True}
-
-                            elif date.day == 16 and student_id.is_absent:
-                                val = {'one_6': False}
-
-                            elif date.day == 16 and not student_id.is_absent:
-                                val = {'one_6': True}
-
-                            elif date.day == 17 and student_id.is_absent:
-                                val = {'one_7': False}
-
-                            elif date.day == 17 and not student_id.is_absent:
-                                val = {'one_7': True}
-
-                            elif date.day == 18 and student_id.is_absent:
-                                val = {'one_8': False}
-
-                            elif date.day == 18 and not student_id.is_absent:
-                                val = {'one_8': True}
-
-                            elif date.day == 19 and student_id.is_absent:
-                                val = {'one_9': False}
-
-                            elif date.day == 19 and not student_id.is_absent:
-                                val = {'one_9': True}
-
-                            elif date.day == 20 and student_id.is_absent:
-                                val = {'one_0': False}
-
-                            elif date.day == 20 and not student_id.is_absent:
-                                val = {'one_0': True}
-
-                            elif date.day == 21 and student_id.is_absent:
-                                val = {'two_1': False}
-
-                            elif date.day == 21 and not student_id.is_absent:
-                                val = {'two_1': True}
-
-                            elif date.day == 22 and student_id.is_absent:
-                                val = {'two_2': False}
-
-                            elif date.day == 22 and not student_id.is_absent:
-                                val = {'two_2': True}
-
-                            elif date.day == 23 and student_id.is_absent:
-                                val = {'two_3': False}
-
-                            elif date.day == 23 and not student_id.is_absent:
-                                val = {'two_3': True}
-
-                            elif date.day == 24 and student_id.is_absent:
-                                val = {'two_4': False}
-
-                            elif date.day == 24 and not student_id.is_absent:
-                                val = {'two_4': True}
-
-                            elif date.day == 25 and student_id.is_absent:
-                                val = {'two_5': False}
-
-                            elif date.day == 25 and not student_id.is_absent:
-                                val = {'two_5': True}
-
-                            elif date.day == 26 and student_id.is_absent:
-                                val = {'two_6': False}
-
-                            elif date.day == 26 and not student_id.is_absent:
-                                val = {'two_6': True}
-
-                            elif date.day == 27 and student_id.is_absent:
-                                val = {'two_7': False}
-
-                            elif date.day == 27 and not student_id.is_absent:
-                                val = {'two_7': True}
-
-                            elif date.day == 28 and student_id.is_absent:
-                                val = {'two_8': False}
-
-                            elif date.day == 28 and not student_id.is_absent:
-                                val = {'two_8': True}
-
-                            elif date.day == 29 and student_id.is_absent:
-                                val = {'two_9': False}
-
-                            elif date.day == 29 and not student_id.is_absent:
-                                val = {'two_9': True}
-
-                            elif date.day == 30 and student_id.is_absent:
-                                val = {'two_0': False}
-
-                            elif date.day == 30 and not student_id.is_absent:
-                                val = {'two_0': True}
-
-                            elif date.day == 31 and student_id.is_absent:
-                                val = {'three_1': False}
-
-                            elif date.day == 31 and not student_id.is_absent:
-                                val = {'three_1': True}
-                            else:
-                                val = {}
-                            if search_id:
-                                search_id.write(val)
-                else:
-                    for student_id in line.student_ids:
-                        search_id = sheet_line_obj.\
-                            search([('roll_no', '=', student_id.roll_no),
-                                    ('standard_id', '=',
-                                     attendance_sheet_id.id)])
-
-                        if date.day == 1 and student_id.is_absent:
-                            val = {'one': False}
-
-                        elif date.day == 1 and not student_id.is_absent:
-                            val = {'one': True}
-
-                        elif date.day == 2 and student_id.is_absent:
-                            val = {'two': False}
-
-                        elif date.day == 2 and not student_id.is_absent:
-                            val = {'two': True}
-
-                        elif date.day == 3 and student_id.is_absent:
-                            val = {'three': False}
-
-                        elif date.day == 3 and not student_id.is_absent:
-                            val = {'three': True}
-
-                        elif date.day == 4 and student_id.is_absent:
-                            val = {'four': False}
-
-                        elif date.day == 4 and not student_id.is_absent:
-                            val = {'four': True}
-
-                        elif date.day == 5 and student_id.is_absent:
-                            val = {'five': False}
-
-                        elif date.day == 5 and not student_id.is_absent:
-                            val = {'five': True}
-
-                        elif date.day == 6 and student_id.is_absent:
-                            val = {'six': False}
-
-                        elif date.day == 6 and not student_id.is_absent:
-                            val = {'six': True}
-
-                        elif date.day == 7 and student_id.is_absent:
-                            val = {'seven': False}
-
-                        elif date.day == 7 and not student_id.is_absent:
-                            val = {'seven': True}
-
-                        elif date.day == 8 and student_id.is_absent:
-                            val = {'eight': False}
-
-                        elif date.day == 8 and not student_id.is_absent:
-                            val = {'eight': True}
-
-                        elif date.day == 9 and student_id.is_absent:
-                            val = {'nine': False}
-
-                        elif date.day == 9 and not student_id.is_absent:
-                            val = {'nine': True}
-
-                        elif date.day == 10 and student_id.is_absent:
-                            val = {'ten': False}
-
-                        elif date.day == 10 and not student_id.is_absent:
-                            val = {'ten': True}
-
-                        elif date.day == 11 and student_id.is_absent:
-                            val = {'one_1': False}
-
-                        elif date.day == 11 and not student_id.is_absent:
-                            val = {'one_1': True}
-
-                        elif date.day == 12 and student_id.is_absent:
-                            val = {'one_2': False}
-
-                        elif date.day == 12 and not student_id.is_absent:
-                            val = {'one_2': True}
-
-                        elif date.day == 13 and student_id.is_absent:
-                            val = {'one_3': False}
-
-                        elif date.day == 13 and not student_id.is_absent:
-                            val = {'one_3': True}
-
-                        elif date.day == 14 and student_id.is_absent:
-                            val = {'one_4': False}
-
-                        elif date.day == 14 and not student_id.is_absent:
-                            val = {'one_4': True}
-
-                        elif date.day == 15 and student_id.is_absent:
-                            val = {'one_5': False}
-
-                        elif date.day == 15 and not student_id.is_absent:
-                            val = {'one_5': True}
-
-                        elif date.day == 16 and student_id.is_absent:
-                            val = {'one_6': False}
-
-                        elif date.day == 16 and not student_id.is_absent:
-                            val = {'one_6': True}
-
-                        elif date.day == 17 and student_id.is_absent:
-                            val = {'one_7': False}
-
-                        elif date.day == 17 and not student_id.is_absent:
-                            val = {'one_7': True}
-
-                        elif date.day == 18 and student_id.is_absent:
-                            val = {'one_8': False}
-
-                        elif date.day == 18 and not student_id.is_absent:
-                            val = {'one_8': True}
-
-                        elif date.day == 19 and student_id.is_absent:
-                            val = {'one_9': False}
-
-                        elif date.day == 19 and not student_id.is_absent:
-                            val = {'one_9': True}
-
-                        elif date.day == 20 and student_id.is_absent:
-                            val = {'one_0': False}
-
-                        elif date.day == 20 and not student_id.is_absent:
-                            val = {'one_0': True}
-
-                        elif date.day == 21 and student_id.is_absent:
-                            val = {'two_1': False}
-
-                        elif date.day == 21 and not student_id.is_absent:
-                            val = {'two_1': True}
-
-                        elif date.day == 22 and student_id.is_absent:
-                            val = {'two_2': False}
-
-                        elif date.day == 22 and not student_id.is_absent:
-                            val = {'two_2': True}
-
-                        elif date.day == 23 and student_id.is_absent:
-                            val = {'two_3': False}
-
-                        elif date.day == 23 and not student_id.is_absent:
-                            val = {'two_3': True}
-
-                        elif date.day == 24 and student_id.is_absent:
-                            val = {'two_4': False}
-
-                        elif date.day == 24 and not student_id.is_absent:
-                            val = {'two_4': True}
-
-                        elif date.day == 25 and student_id.is_absent:
-                            val = {'two_5': False}
-
-                        elif date.day == 25 and not student_id.is_absent:
-                            val = {'two_5': True}
-
-                        elif date.day == 26 and student_id.is_absent:
-                            val = {'two_6': False}
-
-                        elif date.day == 26 and not student_id.is_absent:
-                            val = {'two_6': True}
-
-                        elif date.day == 27 and student_id.is_absent:
-                            val = {'two_7': False}
-
-                        elif date.day == 27 and not student_id.is_absent:
-                            val = {'two_7': True}
-
-                        elif date.day == 28 and student_id.is_absent:
-                            val = {'two_8': False}
-
-                        elif date.day == 28 and not student_id.is_absent:
-                            val = {'two_8': True}
-
-                        elif date.day == 29 and student_id.is_absent:
-                            val = {'two_9': False}
-
-                        elif date.day == 29 and not student_id.is_absent:
-                            val = {'two_9': True}
-
-                        elif date.day == 30 and student_id.is_absent:
-                            val = {'two_0': False}
+    @api.model
+    def get_attendance_matrix(self, date_start, date_stop, student_ids):
+        '''Return the validated attendance of students between two dates.
+
+        @param student_ids : ids of the students to load
+        @return : dictionary mapping every student id to a string holding
+                  one ``P`` or ``A`` flag per day, starting at date_start
+        '''
+        days = (date_stop - date_start).days + 1
+        matrix = {student_id: ['A'] * days for student_id in student_ids}
+        if matrix and days > 0:
+            self.flush(['date', 'state'])
+            self.env['daily.attendance.line'].flush(['standard_id',
+                                                     'stud_id',
+                                                     'is_present'])
+            self._cr.execute("""
+                SELECT line.stud_id, att.date - %s
+                FROM daily_attendance_line AS line
+                JOIN daily_attendance AS att ON att.id = line.standard_id
+                WHERE att.state = 'validate'
+                AND att.date BETWEEN %s AND %s
+                AND line.stud_id IN %s
+                AND line.is_present
+                GROUP BY line.stud_id, att.date""",
+                             (date_start, date_start, date_stop,
+                              tuple(matrix)))
+            for student_id, day_index in self._cr.fetchall():
+                matrix[student_id][day_index] = 'P'
+        return {student_id: ''.join(flags)
+                for student_id, flags in matrix.items()}
 
-                        elif date.day == 30 and not student_id.is_absent:
-                            val = {'two_0': True}
+    @api.model
+    def validate_attendance_date(self, attendance_date):
+        '''Validate the draft daily sheets of every class for a date.'''
+        return self.search([('date', '=', attendance_date),
+                            ('state', '=', 'draft')]).attendance_validate()
 
-                        elif date.day == 31 and student_id.is_absent:
-                            val = {'three_1': False}
+    @api.model
+    def import_attendance(self, rows, batch_size=1000, validate=False):
+        '''Load attendance events in bulk, e.g. from gate scanner logs.
+
+        Rows are consumed as a stream and written batch by batch: the
+        daily sheets of each class and date are created when missing, with
+        every student absent until scanned, and the lines of a batch are
+        updated with a single UPDATE.
+        @param rows : iterable of (student, standard_id, date, status)
+                      rows, student being the student ID (pid) or the roll
+                      number in the class and status a boolean or a
+                      value like P/A, present/absent or 1/0
+        @param batch_size : number of rows written at once
+        @param validate : validate the loaded daily sheets afterwards
+        @return : dictionary with the ids of the loaded daily sheets, the
+                  number of loaded rows and the rejected rows as
+                  (row number, row, reason) tuples
+        '''
+        result = {'daily_attendance_ids': [], 'loaded': 0, 'rejected': []}
+        students = {}
+        loaded = set()
+        batch = []
+        for index, row in enumerate(rows, 1):
+            batch.append((index, row))
+            if len(batch) >= batch_size:
+                loaded |= self._import_attendance_batch(batch, students,
+                                                        result)
+                batch = []
+        if batch:
+            loaded |= self._import_attendance_batch(batch, students, result)
+        daily_attendances = self.browse(sorted(loaded))
+        if validate:
+            daily_attendances.filtered(
+                lambda rec: rec.state == 'draft').attendance_validate()
+        result['daily_attendance_ids'] = daily_attendances.ids
+        return result
 
-                        elif date.day == 31 and not student_id.is_absent:
-                            val = {'three_1': True}
-                        else:
-                            val = {}
-                        if search_id:
-                            search_id.write(val)
-        self.state = 'validate'
-        return True
+    @api.model
+    def import_attendance_csv(self, csv_data, **kwargs):
+        '''Load attendance events from CSV data.
+
+        The columns are student, standard, date and status as described
+        in import_attendance(); a header row starting with "student" is
+        skipped.
+        '''
+        if isinstance(csv_data, bytes):
+            csv_data = csv_data.decode('utf-8')
+        rows = (row for row in csv.reader(io.StringIO(csv_data))
+                if row and row[0].strip().lower() != 'student')
+        return self.import_attendance(rows, **kwargs)
+
+    def _import_attendance_students(self, standard_ids):
+        '''Map the student ID and roll number of the confirmed students of
+        each class to their (id, roll number).'''
+        students = {standard_id: {} for standard_id in standard_ids}
+        for stud in self.env['student.student'].search_read(
+                [('standard_id', 'in', list(standard_ids)),
+                 ('state', '=', 'done')],
+                ['pid', 'roll_no', 'standard_id']):
+            value = (stud['id'], stud['roll_no'])
+            class_students = students[stud['standard_id'][0]]
+            class_students[str(stud['roll_no'])] = value
+            if stud['pid']:
+                class_students[stud['pid']] = value
+        return students
+
+    def _import_attendance_batch(self, batch, students, result):
+        '''Write one batch of import_attendance() rows.
+
+        @param students : cache of _import_attendance_students() results
+        @return : set of ids of the daily sheets touched by the batch
+        '''
+        line_obj = self.env['daily.attendance.line']
+        rejected = result['rejected']
+        today = date.today()
+        parsed = []
+        for index, row in batch:
+            try:
+                student, standard_id, att_date, status = row
+                standard_id = int(standard_id)
+                att_date = fields.Date.to_date(att_date)
+            except (TypeError, ValueError):
+                rejected.append((index, row, _('Malformed row')))
+                continue
+            present = presence_value(status)
+            if present is None:
+                rejected.append((index, row, _('Unknown status')))
+            elif not att_date or att_date > today:
+                rejected.append((index, row, _('Invalid date')))
+            else:
+                parsed.append((index, row, str(student).strip(),
+                               standard_id, att_date, present))
+        missing = {item[3] for item in parsed} - set(students)
+        if missing:
+            students.update(self._import_attendance_students(missing))
+
+        # Events of the batch keyed by class, date and student; a later
+        # event of the same student and day wins.
+        events = {}
+        for index, row, student, standard_id, att_date, present in parsed:
+            stud = students[standard_id].get(student)
+            if not stud:
+                rejected.append((index, row, _('Unknown student')))
+                continue
+            events[(standard_id, att_date, stud[0])] = (index, row, stud[1],
+                                                        present)
+        if not events:
+            return set()
+
+        # Resolve the daily sheets, creating the missing ones.
+        self.flush(['standard_id', 'date', 'state'])
+        sheet_keys = {key[:2] for key in events}
+        self._cr.execute("""
+            SELECT standard_id, date, id, state FROM daily_attendance
+            WHERE (standard_id, date) IN %s""", (tuple(sheet_keys),))
+        sheets = {}
+        for standard_id, att_date, sheet_id, state in self._cr.fetchall():
+            sheets.setdefault((standard_id, att_date), (sheet_id, state))
+        new_keys = [key for key in sheet_keys if key not in sheets]
+        standards = self.env['school.standard'].browse(
+            [key[0] for key in new_keys])
+        teachers = {standard.id: standard.user_id.id
+                    for standard in standards}
+        new_sheets = self.with_context(absent_by_default=True).create(
+            [{'standard_id': key[0],
+              'date': key[1],
+              'user_id': teachers[key[0]]} for key in new_keys])
+        for key, sheet in zip(new_keys, new_sheets):
+            sheets[key] = (sheet.id, 'draft')
+
+        sheet_ids = {sheets[key][0] for key in sheet_keys
+                     if sheets[key][1] == 'draft'}
+        lines = {}
+        for line in line_obj.search_read([('standard_id', 'in',
+                                           list(sheet_ids))],
+                                         ['standard_id', 'stud_id']):
+            if line['stud_id']:
+                lines[(line['standard_id'][0], line['stud_id'][0])] = \
+                    line['id']
+        updates = []
+        new_lines = []
+        for key, event in events.items():
+            index, row, roll_no, present = event
+            sheet_id, state = sheets[key[:2]]
+            if state != 'draft':
+                rejected.append((index, row,
+                                 _('Attendance already validated')))
+                continue
+            line_id = lines.get((sheet_id, key[2]))
+            if line_id:
+                updates.append((line_id, present))
+            else:
+                new_lines.append({'standard_id': sheet_id,
+                                  'stud_id': key[2],
+                                  'roll_no': roll_no,
+                                  'is_present': present,
+                                  'is_absent': not present,
+                                  'present_absentcheck': True})
+            result['loaded'] += 1
+        if updates:
+            line_obj.flush()
+            query = """
+                UPDATE daily_attendance_line AS line
+                SET is_present = val.present,
+                    is_absent = NOT val.present,
+                    present_absentcheck = TRUE,
+                    write_uid = %%s,
+                    write_date = NOW() AT TIME ZONE 'UTC'
+                FROM (VALUES %s) AS val(id, present)
+                WHERE line.id = val.id""" % ', '.join(['%s'] * len(updates))
+            self._cr.execute(query, [self.env.uid] + updates)
+            updated = line_obj.browse([update[0] for update in updates])
+            updated.invalidate_cache(['is_present', 'is_absent',
+                                      'present_absentcheck'], updated.ids)
+            updated.modified(['is_present', 'is_absent'])
+        line_obj.create(new_lines)
+        return sheet_ids
 
 
 class DailyAttendanceLine(models.Model):
@@ -1040,3 +1023,321 @@ class DailyAttendanceLine(models.Model):
         for rec in self:
             if not rec.is_present and not rec.is_absent:
                 raise ValidationError(_('Check Present or Absent!'))
+
+
+class AttendanceSummary(models.Model):
+    '''Defining Monthly Attendance Summary of a Student.'''
+
+    _description = 'Attendance Summary'
+    _name = 'attendance.summary'
+    _rec_name = 'student_id'
+    _order = 'month_id desc, student_id'
+
+    student_id = fields.Many2one('student.student', 'Student', required=True,
+                                 ondelete='cascade', index=True)
+    month_id = fields.Many2one('academic.month', 'Month', required=True,
+                               ondelete='cascade', index=True)
+    year_id = fields.Many2one('academic.year', 'Year',
+                              related='month_id.year_id', store=True)
+    standard_id = fields.Many2one('school.standard', 'Academic Class')
+    present_days = fields.Integer('Present Days', default=0)
+    absent_days = fields.Integer('Absent Days', default=0)
+    leave_days = fields.Integer('Leave Days', default=0,
+                                help="Absent days covered by an approved "
+                                     "leave request")
+    working_days = fields.Integer('Working Days', default=0)
+
+    _sql_constraints = [
+        ('summary_unique', 'unique(student_id, month_id)',
+         'Attendance summary should be unique per student and month!')
+    ]
+
+    def _add_attendance(self, where, params, sign=1):
+        '''Add the validated daily lines matching ``where`` to the summary.
+
+        All the counters are changed with a single INSERT ... ON CONFLICT,
+        ``sign`` is -1 to take the lines out of the summary again.
+        '''
+        self.flush()
+        self.env['daily.attendance'].flush(['date', 'standard_id', 'state'])
+        self.env['daily.attendance.line'].flush(['standard_id', 'stud_id',
+                                                 'is_present'])
+        self.env['studentleave.request'].flush(['state', 'student_id',
+                                                'start_date', 'end_date'])
+        query = """
+            INSERT INTO attendance_summary AS summary
+                (student_id, month_id, year_id, standard_id, present_days,
+                 absent_days, leave_days, create_uid, create_date,
+                 write_uid, write_date)
+            SELECT line.stud_id, month.id, month.year_id,
+                   MAX(att.standard_id),
+                   %%(sign)s * COUNT(*) FILTER (WHERE line.is_present),
+                   %%(sign)s * COUNT(*) FILTER (
+                       WHERE line.is_present IS NOT TRUE),
+                   %%(sign)s * COUNT(*) FILTER (
+                       WHERE line.is_present IS NOT TRUE AND EXISTS (
+                           SELECT 1 FROM studentleave_request AS leave
+                           WHERE leave.student_id = line.stud_id
+                           AND leave.state = 'approve'
+                           AND att.date BETWEEN leave.start_date
+                                            AND leave.end_date)),
+                   %%(uid)s, NOW() AT TIME ZONE 'UTC',
+                   %%(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM daily_attendance_line AS line
+            JOIN daily_attendance AS att ON att.id = line.standard_id
+            JOIN academic_month AS month
+                ON att.date BETWEEN month.date_start AND month.date_stop
+            WHERE line.stud_id IS NOT NULL AND %s
+            GROUP BY line.stud_id, month.id, month.year_id
+            ON CONFLICT (student_id, month_id) DO UPDATE SET
+                standard_id = EXCLUDED.standard_id,
+                present_days = summary.present_days + EXCLUDED.present_days,
+                absent_days = summary.absent_days + EXCLUDED.absent_days,
+                leave_days = summary.leave_days + EXCLUDED.leave_days,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            RETURNING id""" % where
+        params = dict(params, sign=sign, uid=self.env.uid)
+        self._cr.execute(query, params)
+        summaries = self.browse([row[0] for row in self._cr.fetchall()])
+        self.invalidate_cache()
+        summaries._update_working_days()
+        return summaries
+
+    def _update_working_days(self):
+        '''Copy the working days of the month of each school.'''
+        groups = {}
+        for rec in self:
+            key = (rec.month_id, rec.standard_id.school_id.id)
+            groups.setdefault(key, []).append(rec.id)
+        for (month, school_id), summary_ids in groups.items():
+            self._cr.execute("""
+                UPDATE attendance_summary SET working_days = %s
+                WHERE id IN %s""", (len(month.get_working_days(school_id)),
+                                    tuple(summary_ids)))
+        self.invalidate_cache(['working_days'], self.ids)
+        return True
+
+    @api.model
+    def add_daily_attendance(self, daily_attendances, sign=1):
+        '''Count validated daily sheets in (or, with sign -1, out of) the
+        summary.'''
+        if not daily_attendances:
+            return self.browse()
+        return self._add_attendance('att.id IN %(att_ids)s',
+                                    {'att_ids': tuple(daily_attendances.ids)},
+                                    sign)
+
+    @api.model
+    def rebuild(self, month_ids=None):
+        '''Recompute the summary from the validated daily sheets.
+
+        @param month_ids : ids of the academic months to rebuild, every
+                           month when not given
+        '''
+        self.flush()
+        where = "att.state = 'validate'"
+        params = {}
+        if month_ids:
+            self._cr.execute("DELETE FROM attendance_summary "
+                             "WHERE month_id IN %s", (tuple(month_ids),))
+            where += " AND month.id IN %(month_ids)s"
+            params['month_ids'] = tuple(month_ids)
+        else:
+            self._cr.execute("DELETE FROM attendance_summary")
+        self.invalidate_cache()
+        return self._add_attendance(where, params)
+
+
+class LectureAttendance(models.Model):
+    '''Defining Lecture Wise Attendance of a Class for a Day.'''
+
+    _description = 'Lecture Attendance'
+    _name = 'lecture.attendance'
+    _rec_name = 'standard_id'
+    _order = 'date desc'
+
+    date = fields.Date("Date", required=True,
+                       default=lambda *a: time.strftime('%Y-%m-%d'),
+                       states={'validate': [('readonly', True)]})
+    standard_id = fields.Many2one('school.standard', 'Academic Class',
+                                  required=True, help="Select Standard",
+                                  states={'validate': [('readonly', True)]})
+    timetable_id = fields.Many2one('time.table', 'TimeTable', readonly=True,
+                                   help="Timetable the periods come from")
+    period_ids = fields.One2many('lecture.attendance.period', 'lecture_id',
+                                 'Periods', readonly=True)
+    line_ids = fields.One2many('lecture.attendance.line', 'lecture_id',
+                               'Students',
+                               states={'validate': [('readonly', True)]})
+    state = fields.Selection([('draft', 'Draft'), ('validate', 'Validate')],
+                             'State', readonly=True, default='draft')
+
+    _sql_constraints = [
+        ('lecture_unique', 'unique(standard_id, date)',
+         'Lecture attendance should be unique per class and day!')
+    ]
+
+    def attendance_validate(self):
+        '''Method to validate lecture attendance.'''
+        self.write({'state': 'validate'})
+        return True
+
+    def attendance_draft(self):
+        '''Change the state of lecture attendance to draft.'''
+        self.write({'state': 'draft'})
+        return True
+
+    @api.model
+    def generate_lecture_sheets(self, att_date, standard_ids=None):
+        '''Create the lecture sheets of a day from the regular timetables.
+
+        Every class having lectures on that weekday gets one sheet with
+        its periods and one line per confirmed student, present in every
+        period unless on an approved leave. Classes which already have a
+        sheet for the day are skipped.
+        @param att_date : day of the lectures
+        @param standard_ids : ids of the classes, all classes when not given
+        @return : recordset of the created sheets
+        '''
+        att_date = fields.Date.to_date(att_date)
+        domain = [('timetable_type', '=', 'regular'),
+                  ('year_id.date_start', '<=', att_date),
+                  ('year_id.date_stop', '>=', att_date)]
+        if standard_ids:
+            domain.append(('standard_id', 'in', standard_ids))
+        timetables = self.env['time.table'].search(domain)
+        done = set(self.search([('date', '=', att_date),
+                                ('standard_id', 'in',
+                                 timetables.mapped('standard_id').ids)]
+                               ).mapped('standard_id').ids)
+        lectures = {}
+        for line in self.env['time.table.line'].search(
+                [('table_id', 'in', timetables.ids),
+                 ('week_day', '=', att_date.strftime('%A').lower())],
+                order='start_time, id'):
+            standard_id = line.table_id.standard_id.id
+            if standard_id in done:
+                continue
+            table, periods = lectures.setdefault(standard_id,
+                                                 (line.table_id, []))
+            if line.table_id == table:
+                periods.append(line)
+        for table, periods in lectures.values():
+            if len(periods) > MAX_PERIODS:
+                raise ValidationError(_('''Timetable %s has more than %s \
+lectures on the same day!''') % (table.name, MAX_PERIODS))
+        if not lectures:
+            return self.browse()
+
+        students = {standard_id: [] for standard_id in lectures}
+        for stud in self.env['student.student'].search_read(
+                [('standard_id', 'in', list(lectures)),
+                 ('state', '=', 'done')], ['roll_no', 'standard_id']):
+            students[stud['standard_id'][0]].append(stud)
+        on_leave = self.env['studentleave.request'].get_students_on_leave(
+            list(lectures), att_date)
+        vals_list = []
+        for standard_id, (table, periods) in lectures.items():
+            full_mask = (1 << len(periods)) - 1
+            vals_list.append({
+                'date': att_date,
+                'standard_id': standard_id,
+                'timetable_id': table.id,
+                'period_ids': [(0, 0, {'sequence': sequence,
+                                       'timetable_line_id': period.id,
+                                       'subject_id': period.subject_id.id,
+                                       'teacher_id': period.teacher_id.id,
+                                       'start_time': period.start_time,
+                                       'end_time': period.end_time})
+                               for sequence, period in enumerate(periods, 1)],
+                'line_ids': [(0, 0, {'student_id': stud['id'],
+                                     'roll_no': stud['roll_no'],
+                                     'period_mask': (stud['id'] not in
+                                                     on_leave and full_mask or
+                                                     0)})
+                             for stud in students[standard_id]]})
+        return self.create(vals_list)
+
+
+class LectureAttendancePeriod(models.Model):
+    '''Defining a Period of a Lecture Attendance Sheet.'''
+
+    _description = 'Lecture Attendance Period'
+    _name = 'lecture.attendance.period'
+    _order = 'sequence'
+    _rec_name = 'subject_id'
+
+    lecture_id = fields.Many2one('lecture.attendance', 'Lecture Attendance',
+                                 required=True, ondelete='cascade',
+                                 index=True)
+    sequence = fields.Integer('Period', required=True,
+                              help="Position of the period in the day")
+    timetable_line_id = fields.Many2one('time.table.line', 'Lecture',
+                                        ondelete='set null')
+    subject_id = fields.Many2one('subject.subject', 'Subject Name')
+    teacher_id = fields.Many2one('school.teacher', 'Faculty Name')
+    start_time = fields.Float('Start Time')
+    end_time = fields.Float('End Time')
+
+
+class LectureAttendanceLine(models.Model):
+    '''Defining Lecture Attendance of a Student for a Day.'''
+
+    _description = 'Lecture Attendance Line'
+    _name = 'lecture.attendance.line'
+    _order = 'roll_no'
+    _rec_name = 'student_id'
+
+    @api.depends('period_mask', 'lecture_id.period_ids')
+    def _compute_period_flags(self):
+        '''Method to show the period mask as one P/A flag per period.'''
+        for rec in self:
+            rec.period_flags = ''.join(
+                rec.period_mask & period_bit(period.sequence) and 'P' or 'A'
+                for period in rec.lecture_id.period_ids)
+
+    def _inverse_period_flags(self):
+        '''Method to read the period mask back from the P/A flags.'''
+        for rec in self:
+            mask = 0
+            for sequence, flag in enumerate(rec.period_flags or '', 1):
+                if flag.upper() == 'P':
+                    mask |= period_bit(sequence)
+            rec.period_mask = mask
+
+    @api.depends('period_mask')
+    def _compute_present_periods(self):
+        '''Method to count the periods attended.'''
+        for rec in self:
+            rec.present_periods = bin(rec.period_mask or 0).count('1')
+
+    lecture_id = fields.Many2one('lecture.attendance', 'Lecture Attendance',
+                                 required=True, ondelete='cascade',
+                                 index=True)
+    student_id = fields.Many2one('student.student', 'Student', required=True)
+    roll_no = fields.Integer('Roll No.', help='Roll Number')
+    period_mask = fields.Integer('Periods Attended', default=0,
+                                 help="Bit n-1 is set when the student "
+                                      "attended period n")
+    period_flags = fields.Char('Attendance', compute="_compute_period_flags",
+                               inverse="_inverse_period_flags",
+                               help="One P (present) or A (absent) flag per "
+                                    "period of the day")
+    present_periods = fields.Integer('Present Periods',
+                                     compute="_compute_present_periods",
+                                     store=True)
+
+    def set_period(self, sequence):
+        '''Mark the students present in the given period.'''
+        bit = period_bit(sequence)
+        update_bitmasks(self, 'period_mask',
+                        {rec.id: (bit, 0) for rec in self})
+        return True
+
+    def clear_period(self, sequence):
+        '''Mark the students absent in the given period.'''
+        bit = period_bit(sequence)
+        update_bitmasks(self, 'period_mask',
+                        {rec.id: (0, bit) for rec in self})
+        return True
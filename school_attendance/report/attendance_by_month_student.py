@@ -39,27 +39,25 @@ class BatchExamReport(models.AbstractModel):
             stu_list += student
         return stu_list
 
+    def get_attendance_matrix(self, form):
+        '''Load the P/A flags of all the printed students at once.'''
+        attend_month = self.env['student.attendance.by.month'
+                                ].browse(form.get('id'))
+        return self.env['daily.attendance'].get_attendance_matrix(
+            attend_month.month.date_start, attend_month.month.date_stop,
+            form.get('stud_ids') or [])
+
     def daily_attendance(self, form, day, student):
         attend_month = self.env['student.attendance.by.month'
                                 ].browse(form.get('id'))
-        st_date = attend_month.month.date_start.strftime('%Y-%m-%d')
-#        end_dt = attend_month.month.date_stop
-        attend_obj = self.env['daily.attendance']
-        start_date = datetime.strptime(st_date, '%Y-%m-%d')
+        start_date = attend_month.month.date_start
         if day - start_date.day >= 0:
             attend_date = start_date + rd(days=+day - start_date.day)
         else:
             attend_date = start_date + rd(days=+day + start_date.day)
-        sheets = attend_obj.search([('state', '=', 'validate'),
-                                    ('date',
-                                     '=', attend_date)])
-        flag = 'A'
-        for sheet in sheets:
-            for line in sheet.student_ids:
-                if line.stud_id.id == student.id:
-                    if line.is_present:
-                        flag = 'P'
-        return flag
+        flags = self.env['daily.attendance'].get_attendance_matrix(
+            attend_date, attend_date, [student.id])
+        return flags[student.id]
 
     @api.model
     def _get_report_values(self, docids, data=None):
@@ -74,5 +72,7 @@ class BatchExamReport(models.AbstractModel):
                 'docs': docs,
                 'get_header_data': self.get_header_data,
                 'daily_attendance': self.daily_attendance,
+                'attendance_matrix': self.get_attendance_matrix(
+                    data['form']),
                 'get_student': self.get_student,
                 }
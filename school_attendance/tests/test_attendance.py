@@ -81,3 +81,203 @@ class TestAttendance(common.TransactionCase):
         self.assertEqual(self.monthly_attendance.year_id,
                          self.monthly_attendance.month_id.year_id)
         self.assertEqual(self.studentleave_create.student_id.state, 'done')
+
+    def test_attendance_day_mask(self):
+        sheet_line = self.sheet_line.create({'roll_no': 99,
+                                             'name': 'Mask Student'})
+        sheet_line.set_day(1)
+        sheet_line.set_day(31)
+        self.assertTrue(sheet_line.one)
+        self.assertTrue(sheet_line.three_1)
+        self.assertEqual(sheet_line.days_present()[sheet_line.id], 2)
+        sheet_line.clear_day(1)
+        self.assertFalse(sheet_line.one)
+        sheet_line.write({'two': True})
+        self.assertEqual(sheet_line.day_mask, (1 << 1) | (1 << 30))
+
+    def test_attendance_validate_date(self):
+        att_date = self.daily_attendance.date
+        self.daily_attendance.state = 'draft'
+        self.daily_attendance_obj.validate_attendance_date(att_date)
+        self.assertEqual(self.daily_attendance.state, 'validate')
+        sheet_lines = self.sheet_line.search(
+            [('standard_id.standard_id', '=', self.school_std.id),
+             ('standard_id.month_id.date_start', '<=', att_date),
+             ('standard_id.month_id.date_stop', '>=', att_date)])
+        for sheet_line in sheet_lines:
+            line = self.daily_attendance.student_ids.filtered(
+                lambda rec: rec.roll_no == sheet_line.roll_no)
+            if line:
+                self.assertEqual(
+                    bool(sheet_line.day_mask & (1 << (att_date.day - 1))),
+                    line.is_present)
+
+    def test_attendance_matrix(self):
+        att_date = self.daily_attendance.date
+        students = self.daily_attendance.student_ids.mapped('stud_id')
+        matrix = self.daily_attendance_obj.get_attendance_matrix(
+            att_date - rd(days=1), att_date + rd(days=1), students.ids)
+        for line in self.daily_attendance.student_ids:
+            self.assertEqual(len(matrix[line.stud_id.id]), 3)
+            if line.is_present:
+                self.assertEqual(matrix[line.stud_id.id][1], 'P')
+
+    def test_students_on_leave(self):
+        leave = self.studentleave_create
+        leave.approve_state()
+        on_leave = self.student_leave_request.get_students_on_leave(
+            leave.standard_id.id, leave.start_date, leave.end_date)
+        self.assertIn(self.stud_id.id, on_leave)
+        on_leave = self.student_leave_request.get_students_on_leave(
+            leave.standard_id.id, leave.end_date + rd(days=1))
+        self.assertNotIn(self.stud_id.id, on_leave)
+
+    def test_attendance_summary(self):
+        summary_obj = self.env['attendance.summary']
+        line = self.daily_attendance.student_ids[:1]
+        summary = summary_obj.search([('student_id', '=', line.stud_id.id)])
+        present = sum(summary.mapped('present_days'))
+        self.daily_attendance.attendance_draft()
+        summary = summary_obj.search([('student_id', '=', line.stud_id.id)])
+        self.assertEqual(sum(summary.mapped('present_days')),
+                         present - (line.is_present and 1 or 0))
+        self.daily_attendance.attendance_validate()
+        summary_obj.rebuild()
+        summary = summary_obj.search([('student_id', '=', line.stud_id.id)])
+        self.assertEqual(sum(summary.mapped('present_days')), present)
+
+    def test_import_attendance(self):
+        student = self.daily_attendance.student_ids[:1].stud_id
+        att_date = datetime.now().date() - rd(days=2)
+        result = self.daily_attendance_obj.import_attendance(
+            [(student.pid, self.school_std.id, att_date, 'A'),
+             ('unknown', self.school_std.id, att_date, 'P'),
+             (student.pid, self.school_std.id, att_date, 'maybe')])
+        self.assertEqual(result['loaded'], 1)
+        self.assertEqual([rej[0] for rej in result['rejected']], [2, 3])
+        daily = self.daily_attendance_obj.browse(
+            result['daily_attendance_ids'])
+        line = daily.student_ids.filtered(
+            lambda rec: rec.stud_id == student)
+        self.assertTrue(line.is_absent)
+        self.assertFalse(line.is_present)
+
+    def test_sheet_view_month_columns(self):
+        sheet_obj = self.attendance_sheet_obj.with_context(
+            start_date='2019-02-01', end_date='2019-02-28')
+        res = sheet_obj.fields_view_get(view_type='form')
+        tree_fields = res['fields']['attendance_ids']['views']['tree'][
+            'fields']
+        self.assertEqual(tree_fields['two_8']['string'], 28)
+        self.assertEqual(tree_fields['two_9']['string'], '')
+        self.assertEqual(tree_fields['three_1']['string'], '')
+        res['fields']['attendance_ids']['views']['tree']['arch'] = ''
+        res = sheet_obj.fields_view_get(view_type='form')
+        self.assertTrue(res['fields']['attendance_ids']['views']['tree'][
+            'arch'])
+
+    def test_lecture_attendance(self):
+        teacher = self.env.ref('school.demo_school_teacher_1')
+        subject = self.env.ref('school.demo_subject_subject_2')
+        att_date = self.academic_year.date_start
+        while att_date.weekday():
+            att_date += rd(days=1)
+        table = self.env['time.table'].create({
+            'name': 'Lecture Timetable',
+            'standard_id': self.school_std.id,
+            'year_id': self.academic_year.id,
+            'timetable_type': 'regular',
+            'timetable_ids': [(0, 0, {'week_day': 'monday',
+                                      'teacher_id': teacher.id,
+                                      'subject_id': subject.id,
+                                      'start_time': start,
+                                      'end_time': start + 1})
+                              for start in (7.0, 8.0)]})
+        lecture_obj = self.env['lecture.attendance']
+        lectures = lecture_obj.generate_lecture_sheets(
+            att_date, table.standard_id.ids)
+        self.assertEqual(lectures.standard_id, table.standard_id)
+        self.assertEqual(len(lectures.period_ids), 2)
+        line = lectures.line_ids.filtered(
+            lambda rec: rec.student_id != self.stud_id)[:1]
+        self.assertTrue(line)
+        self.assertEqual(line.period_mask, 0b11)
+        self.assertEqual(line.present_periods, 2)
+        line.clear_period(1)
+        self.assertEqual(line.period_mask, 0b10)
+        self.assertEqual(line.period_flags, 'AP')
+        line.period_flags = 'PP'
+        self.assertEqual(line.period_mask, 0b11)
+        self.assertFalse(lecture_obj.generate_lecture_sheets(
+            att_date, table.standard_id.ids))
+
+    def test_revert_attendance_date(self):
+        att_date = self.daily_attendance.date
+        self.assertEqual(self.daily_attendance.state, 'validate')
+        reverted = self.daily_attendance_obj.revert_attendance_date(
+            att_date, self.school_std.ids)
+        self.assertIn(self.daily_attendance, reverted)
+        self.assertEqual(self.daily_attendance.state, 'draft')
+        bit = 1 << (att_date.day - 1)
+        sheet_lines = self.sheet_line.search(
+            [('standard_id.standard_id', '=', self.school_std.id),
+             ('standard_id.month_id.date_start', '<=', att_date),
+             ('standard_id.month_id.date_stop', '>=', att_date)])
+        for sheet_line in sheet_lines:
+            self.assertFalse(sheet_line.day_mask & bit)
+
+    def test_sheet_working_days_refresh(self):
+        sheet = self.attendance_sheet_obj.create({
+            'standard_id': self.school_std.id,
+            'month_id': self.month.id,
+            'year_id': self.month.year_id.id})
+        school = self.school_std.school_id
+        calendar = (school.resource_calendar_id or
+                    self.env.company.resource_calendar_id)
+        working_days = sheet.working_days
+        calendar.attendance_ids.filtered(
+            lambda rec: rec.dayofweek == '0').unlink()
+        self.assertEqual(sheet.working_days, len(
+            self.month.get_working_days(school.id)))
+        self.assertLess(sheet.working_days, working_days)
+
+    def test_summary_working_days_refresh(self):
+        summary_obj = self.env['attendance.summary']
+        summaries = summary_obj.search([
+            ('student_id', 'in',
+             self.daily_attendance.student_ids.mapped('stud_id').ids)])
+        self.assertTrue(summaries)
+        school = self.school_std.school_id
+        calendar = (school.resource_calendar_id or
+                    self.env.company.resource_calendar_id)
+        calendar.attendance_ids.filtered(
+            lambda rec: rec.dayofweek == '0').unlink()
+        for summary in summaries:
+            self.assertEqual(summary.working_days, len(
+                summary.month_id.get_working_days(
+                    summary.standard_id.school_id.id)))
+
+    def test_import_attendance_absent_students(self):
+        students = self.daily_attendance.student_ids.mapped('stud_id')[:3]
+        self.assertEqual(len(students), 3)
+        att_date = datetime.now().date()
+        leave = self.student_leave_request.create({
+            'name': 'Import Leave',
+            'student_id': students[1].id,
+            'start_date': att_date,
+            'end_date': att_date,
+            'reason': 'Sick'})
+        leave.approve_state()
+        self.daily_attendance_obj.search(
+            [('standard_id', '=', self.school_std.id),
+             ('date', '=', att_date)]).unlink()
+        result = self.daily_attendance_obj.import_attendance(
+            [(students[0].pid, self.school_std.id, att_date, 'P')])
+        daily = self.daily_attendance_obj.browse(
+            result['daily_attendance_ids'])
+        present = {line.stud_id: line.is_present
+                   for line in daily.student_ids}
+        self.assertTrue(present[students[0]])
+        # Students on leave and students missing from the log are absent.
+        self.assertFalse(present[students[1]])
+        self.assertFalse(present[students[2]])
@@ -0,0 +1,36 @@
+# See LICENSE file for full copyright and licensing details.
+
+import time
+from odoo import models, fields
+
+
+class LectureAttendanceGenerate(models.TransientModel):
+    '''For Generating Lecture Attendance Sheets.'''
+
+    _name = "lecture.attendance.generate"
+    _description = "Generate Lecture Attendance Wizard"
+
+    date = fields.Date('Date', required=True,
+                       default=lambda *a: time.strftime('%Y-%m-%d'))
+    standard_ids = fields.Many2many('school.standard', string='Classes',
+                                    help="Leave empty to generate the sheets "
+                                         "of every class")
+
+    def generate_lecture_attendance(self):
+        ''' This method creates the lecture attendance sheets of the day
+            and opens them
+            @param self : Object Pointer
+            @return : action of the lecture attendance sheets
+        '''
+        self.ensure_one()
+        lecture_obj = self.env['lecture.attendance']
+        lecture_obj.generate_lecture_sheets(self.date,
+                                            self.standard_ids.ids or None)
+        domain = [('date', '=', self.date)]
+        if self.standard_ids:
+            domain.append(('standard_id', 'in', self.standard_ids.ids))
+        return {'name': 'Lecture Attendance',
+                'view_mode': 'tree,form',
+                'res_model': 'lecture.attendance',
+                'domain': domain,
+                'type': 'ir.actions.act_window'}
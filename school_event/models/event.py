@@ -3,6 +3,7 @@
 import time
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from dateutil.relativedelta import relativedelta
 
 
 class SchoolStandard(models.Model):
@@ -108,12 +109,36 @@ class SchoolEvent(models.Model):
                                       on holiday.')
     color = fields.Integer('Color Index', default=0)
 
+    def _get_holiday_months(self):
+        """Return the academic months overlapping the holiday events."""
+        months = self.env['academic.month'].sudo()
+        for rec in self.filtered('is_holiday'):
+            if rec.start_date and rec.end_date:
+                months |= months.search([('date_start', '<=', rec.end_date),
+                                         ('date_stop', '>=',
+                                          rec.start_date)])
+        return months
+
     def unlink(self):
         for rec in self:
             if rec.state not in ['draft', 'close']:
                 raise ValidationError(_('''You can delete record in unconfirm
                 state only or close state only !'''))
-        return super(SchoolEvent, self).unlink()
+        months = self._get_holiday_months()
+        res = super(SchoolEvent, self).unlink()
+        months._working_days_changed()
+        return res
+
+    def write(self, vals):
+        """Refresh the working days of the months when holidays change."""
+        holiday_fields = {'is_holiday', 'start_date', 'end_date', 'code'}
+        if not holiday_fields.intersection(vals):
+            return super(SchoolEvent, self).write(vals)
+        months = self._get_holiday_months()
+        res = super(SchoolEvent, self).write(vals)
+        months |= self._get_holiday_months()
+        months._working_days_changed()
+        return res
 
     @api.constrains('start_date', 'end_date')
     def _check_dates(self):
@@ -172,6 +197,7 @@ class SchoolEvent(models.Model):
                 st_lst.append(student.user_id.partner_id.id)
                 event_vals.update({'partner_ids': [(6, 0, st_lst)]})
         self.env['calendar.event'].create(event_vals)
+        res._get_holiday_months()._working_days_changed()
         return res
 
 
@@ -272,6 +298,28 @@ class SchoolEventRegistration(models.Model):
             rec.state = 'confirm'
 
 
+class AcademicMonth(models.Model):
+    _inherit = 'academic.month'
+
+    @api.model
+    def _get_holidays(self, school_id, date_start, date_stop):
+        """Override method to close the school on holiday events."""
+        holidays = super(AcademicMonth, self)._get_holidays(school_id,
+                                                            date_start,
+                                                            date_stop)
+        domain = [('is_holiday', '=', True),
+                  ('start_date', '<=', date_stop),
+                  ('end_date', '>=', date_start)]
+        if school_id:
+            domain += ['|', ('code', '=', False), ('code', '=', school_id)]
+        for event in self.env['school.event'].sudo().search(domain):
+            day = max(event.start_date, date_start)
+            while day <= min(event.end_date, date_stop):
+                holidays.add(day)
+                day += relativedelta(days=1)
+        return holidays
+
+
 class StudentStudent(models.Model):
     _name = 'student.student'
     _inherit = 'student.student'
@@ -15,7 +15,8 @@
              'security/ir.model.access.csv',
              'views/timetable_view.xml',
              'views/report_view.xml',
-             'views/timetable.xml'],
+             'views/timetable.xml',
+             'wizard/timetable_generate.xml'],
     'demo': ['demo/timetable_demo.xml'],
     'installable': True,
     'application': True
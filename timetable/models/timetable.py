@@ -1,8 +1,13 @@
 # See LICENSE file for full copyright and licensing details.
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
+# Column of time.table.line identifying the resource booked by a lecture.
+SLOT_COLUMNS = {'teacher': 'teacher_id',
+                'room': 'class_room_id',
+                'class': 'table_id'}
+
 
 class TimeTable(models.Model):
     """Defining model for time table."""
@@ -33,32 +38,41 @@ class TimeTable(models.Model):
                                 compute="_compute_user", store=True)
     class_room_id = fields.Many2one('class.room', 'Room Number')
 
+    @api.model
+    def print_timetables(self, year_id=False):
+        '''Print the regular timetables of every class in one report
+        @param year_id : id of the academic year, the current one by default
+        @return : report action
+        '''
+        if not year_id:
+            year_id = self.env['academic.year'].search(
+                [('current', '=', True)], limit=1).id
+        timetables = self.search([('timetable_type', '=', 'regular'),
+                                  ('year_id', '=', year_id)])
+        return self.env.ref('timetable.report_time_table_qweb').report_action(
+            timetables)
+
     @api.constrains('timetable_ids')
     def _check_lecture(self):
         '''Method to check same lecture is not assigned on same day.'''
-        if self.timetable_type == 'regular':
-            domain = [('table_id', 'in', self.ids)]
-            line_ids = self.env['time.table.line'].search(domain)
-            for rec in line_ids:
-                records = [rec_check.id for rec_check in line_ids
-                           if (rec.week_day == rec_check.week_day and
-                               rec.start_time == rec_check.start_time and
-                               rec.end_time == rec_check.end_time and
-                               rec.teacher_id.id == rec.teacher_id.id)]
-                if len(records) > 1:
-                    raise ValidationError(_('''You cannot set lecture at same \
-time %s  at same day %s for teacher \
-%s..!''') % (rec.start_time,
-                                                         rec.week_day,
-                                                         rec.teacher_id.name))
-                # Checks if time is greater than 24 hours than raise error
-                if rec.start_time > 24:
-                    raise ValidationError(_('''Start Time should be less than \
+        lines = self.filtered(
+            lambda rec: rec.timetable_type == 'regular').mapped(
+            'timetable_ids')
+        for rec in lines:
+            # Checks if time is greater than 24 hours than raise error
+            if rec.start_time > 24:
+                raise ValidationError(_('''Start Time should be less than \
 24 hours!'''))
-                if rec.end_time > 24:
-                    raise ValidationError(_('''End Time should be less than \
+            if rec.end_time > 24:
+                raise ValidationError(_('''End Time should be less than \
 24 hours!'''))
-            return True
+        conflicts = lines._get_slot_conflicts('class')
+        if conflicts:
+            rec = lines.browse(conflicts[0][0])
+            raise ValidationError(_('''You cannot set lecture at same \
+time %s  at same day %s for teacher \
+%s..!''') % (rec.start_time, rec.week_day, rec.teacher_id.name))
+        return True
 
 
 class TimeTableLine(models.Model):
@@ -71,10 +85,11 @@ class TimeTableLine(models.Model):
     @api.constrains('teacher_id', 'subject_id')
     def check_teacher(self):
         '''Check if lecture is not related to teacher than raise error.'''
-        if (self.teacher_id.id not in self.subject_id.teacher_ids.ids and
-                self.table_id.timetable_type == 'regular'):
-            raise ValidationError(_('''The subject %s is not assigned to \
-teacher %s.''') % (self.subject_id.name, self.teacher_id.name))
+        for rec in self:
+            if (rec.teacher_id.id not in rec.subject_id.teacher_ids.ids and
+                    rec.table_id.timetable_type == 'regular'):
+                raise ValidationError(_('''The subject %s is not assigned \
+to teacher %s.''') % (rec.subject_id.name, rec.teacher_id.name))
 
     teacher_id = fields.Many2one('school.teacher', 'Faculty Name',
                                  help="Select Teacher")
@@ -93,32 +108,379 @@ teacher %s.''') % (self.subject_id.name, self.teacher_id.name))
                                  ('saturday', 'Saturday'),
                                  ('sunday', 'Sunday')], "Week day",)
     class_room_id = fields.Many2one('class.room', 'Room Number')
+    locked = fields.Boolean('Locked',
+                            help="Locked lectures are kept when the "
+                            "timetable is generated again")
+
+    def _auto_init(self):
+        res = super(TimeTableLine, self)._auto_init()
+        # Slot indexes backing the overlap lookups of _get_slot_conflicts.
+        for kind, column in SLOT_COLUMNS.items():
+            tools.create_index(self._cr,
+                               'time_table_line_%s_slot_index' % kind,
+                               self._table, [column, 'week_day',
+                                             'start_time', 'end_time'])
+        return res
 
-    @api.constrains('teacher_id', 'class_room_id')
+    def _get_slot_conflicts(self, kind):
+        '''Return the regular lectures of the same academic year
+        overlapping the lectures on the same week day for the same
+        teacher, room or class.
+
+        The lookup is a single query over the slot index of the resource,
+        two lectures overlapping when each one starts before the other
+        one ends.
+        @param kind : 'teacher', 'room' or 'class'
+        @return : list of (line id, overlapping line id) pairs
+        '''
+        if not self.ids:
+            return []
+        column = SLOT_COLUMNS[kind]
+        self.flush(['table_id', 'week_day', 'start_time', 'end_time',
+                    column])
+        self.env['time.table'].flush(['timetable_type', 'year_id'])
+        self._cr.execute("""
+            SELECT line.id, other.id
+            FROM time_table_line line
+            JOIN time_table tab ON tab.id = line.table_id
+            JOIN time_table_line other
+              ON other.%(column)s = line.%(column)s
+             AND other.week_day = line.week_day
+             AND other.start_time < line.end_time
+             AND other.end_time > line.start_time
+             AND other.id != line.id
+            JOIN time_table other_tab ON other_tab.id = other.table_id
+             AND other_tab.year_id = tab.year_id
+            WHERE line.id IN %%s
+              AND tab.timetable_type = 'regular'
+              AND other_tab.timetable_type = 'regular'
+            ORDER BY line.id, other.id""" % {'column': column},
+                         (tuple(self.ids),))
+        return self._cr.fetchall()
+
+    @api.constrains('teacher_id', 'class_room_id', 'week_day', 'start_time',
+                    'end_time')
     def check_teacher_room(self):
         """Check available room for teacher."""
-        timetable_rec = self.env['time.table'].search([('id', '!=',
-                                                        self.table_id.id)])
-        if timetable_rec:
-            for data in timetable_rec:
-                for record in data.timetable_ids:
-                    if (data.timetable_type == 'regular' and
-                            self.table_id.timetable_type == 'regular' and
-                            self.teacher_id == record.teacher_id and
-                            self.week_day == record.week_day and
-                            self.start_time == record.start_time):
-                        raise ValidationError(_('''There is a lecture of \
+        if self._get_slot_conflicts('teacher'):
+            raise ValidationError(_('''There is a lecture of \
 Lecturer at same time!'''))
-                    if (data.timetable_type == 'regular' and
-                            self.table_id.timetable_type == 'regular' and
-                            self.class_room_id == record.class_room_id and
-                            self.start_time == record.start_time):
-                        raise ValidationError(_("The room is occupied."))
+        if self._get_slot_conflicts('room'):
+            raise ValidationError(_("The room is occupied."))
+
+
+class SchoolTeacher(models.Model):
+    _inherit = 'school.teacher'
+
+    timetable_line_ids = fields.One2many('time.table.line', 'teacher_id',
+                                         'Lectures')
+    weekly_periods = fields.Integer('Weekly Periods',
+                                    compute='_compute_weekly_load',
+                                    store=True,
+                                    help="Lectures per week in the regular "
+                                    "timetables of the current year")
+    weekly_hours = fields.Float('Weekly Hours',
+                                compute='_compute_weekly_load', store=True,
+                                help="Hours of lecture per week in the "
+                                "regular timetables of the current year")
+
+    @api.depends('timetable_line_ids.start_time',
+                 'timetable_line_ids.end_time',
+                 'timetable_line_ids.table_id.timetable_type',
+                 'timetable_line_ids.table_id.year_id.current')
+    def _compute_weekly_load(self):
+        '''Method to compute the weekly load of the teachers with one
+        grouped query over their lectures.'''
+        teacher_ids = self._origin.ids
+        loads = {}
+        if teacher_ids:
+            self.env['time.table.line'].flush(['teacher_id', 'table_id',
+                                               'start_time', 'end_time'])
+            self.env['time.table'].flush(['timetable_type', 'year_id'])
+            self.env['academic.year'].flush(['current'])
+            self._cr.execute("""
+                SELECT line.teacher_id, count(*),
+                       sum(line.end_time - line.start_time)
+                FROM time_table_line line
+                JOIN time_table tab ON tab.id = line.table_id
+                JOIN academic_year year ON year.id = tab.year_id
+                WHERE line.teacher_id IN %s
+                  AND tab.timetable_type = 'regular' AND year.current
+                GROUP BY line.teacher_id""", (tuple(teacher_ids),))
+            loads = {row[0]: row[1:] for row in self._cr.fetchall()}
+        for rec in self:
+            rec.weekly_periods, rec.weekly_hours = loads.get(rec._origin.id,
+                                                             (0, 0.0))
+
+    @api.model
+    def get_free_teachers(self, week_day, start_time, end_time,
+                          subject_id=False, year_id=False):
+        '''Return the active teachers without any regular lecture
+        overlapping an interval, looked up by one query over the teacher
+        slot index of the lectures.
+        @param week_day : week day of the interval, e.g. 'tuesday'
+        @param start_time : start of the interval in hours, e.g. 10.0
+        @param end_time : end of the interval in hours, e.g. 11.0
+        @param subject_id : id of a subject the teachers must teach
+        @param year_id : id of the academic year, the current one by
+                         default
+        @return : recordset of school.teacher, the least loaded first
+        '''
+        if not year_id:
+            year_id = self.env['academic.year'].search(
+                [('current', '=', True)], limit=1).id
+        self.env['time.table.line'].flush(['teacher_id', 'table_id',
+                                           'week_day', 'start_time',
+                                           'end_time'])
+        self.env['time.table'].flush(['timetable_type', 'year_id'])
+        self.flush(['weekly_periods'])
+        self._cr.execute("""
+            SELECT teacher.id
+            FROM school_teacher teacher
+            JOIN hr_employee emp ON emp.id = teacher.employee_id
+            WHERE emp.active
+              AND (%(subject)s IS NULL OR EXISTS (
+                   SELECT 1 FROM subject_teacher_rel rel
+                   WHERE rel.teacher_id = teacher.id
+                     AND rel.subject_id = %(subject)s))
+              AND NOT EXISTS (
+                   SELECT 1
+                   FROM time_table_line line
+                   JOIN time_table tab ON tab.id = line.table_id
+                   WHERE line.teacher_id = teacher.id
+                     AND line.week_day = %(week_day)s
+                     AND line.start_time < %(end)s
+                     AND line.end_time > %(start)s
+                     AND tab.timetable_type = 'regular'
+                     AND tab.year_id = %(year)s)
+            ORDER BY teacher.weekly_periods, teacher.id""",
+                         {'subject': subject_id or None,
+                          'week_day': week_day,
+                          'start': start_time,
+                          'end': end_time,
+                          'year': year_id or None})
+        return self.browse([row[0] for row in self._cr.fetchall()])
+
+
+class TimeTablePeriod(models.Model):
+    """Defining the period grid used to generate the timetables."""
+
+    _description = 'Time Table Period'
+    _name = 'time.table.period'
+
+    name = fields.Char('Period', required=True)
+    week_day = fields.Selection([('monday', 'Monday'),
+                                 ('tuesday', 'Tuesday'),
+                                 ('wednesday', 'Wednesday'),
+                                 ('thursday', 'Thursday'),
+                                 ('friday', 'Friday'),
+                                 ('saturday', 'Saturday'),
+                                 ('sunday', 'Sunday')], "Week day",
+                                required=True)
+    start_time = fields.Float('Start Time', required=True,
+                              help="Time according to timeformat of 24 hours")
+    end_time = fields.Float('End Time', required=True,
+                            help="Time according to timeformat of 24 hours")
+    active = fields.Boolean('Active', default=True)
+
+    @api.constrains('start_time', 'end_time')
+    def check_time(self):
+        '''Method to check constraint of start time and end time.'''
+        for rec in self:
+            if rec.start_time >= rec.end_time or rec.end_time > 24:
+                raise ValidationError(_('''Start time should be less than end \
+time and end time less than 24 hours!'''))
+
+
+class TimeTableSubstitution(models.Model):
+    """Defining substitutions of the absent teachers for a day."""
+
+    _description = 'Teacher Substitution'
+    _name = 'time.table.substitution'
+    _order = 'date desc, id desc'
+
+    name = fields.Char('Description')
+    date = fields.Date('Date', required=True, default=fields.Date.today,
+                       states={'confirm': [('readonly', True)]})
+    absent_teacher_ids = fields.Many2many('school.teacher',
+                                          string='Absent Teachers',
+                                          states={'confirm': [('readonly',
+                                                               True)]})
+    line_ids = fields.One2many('time.table.substitution.line',
+                               'substitution_id', 'Substitutions',
+                               states={'confirm': [('readonly', True)]})
+    state = fields.Selection([('draft', 'Draft'), ('confirm', 'Confirmed')],
+                             'Status', default='draft', readonly=True)
+
+    def _get_year(self):
+        '''Return the academic year of the substitution date'''
+        self.ensure_one()
+        return self.env['academic.year'].search(
+            [('date_start', '<=', self.date),
+             ('date_stop', '>=', self.date)], limit=1)
+
+    def _get_busy_intervals(self, year, week_day):
+        '''Return the lectures and substitutions of every teacher on the
+        day of the substitution and the teachers absent that day
+        according to the other confirmed substitutions
+        @param year : academic year of the timetables
+        @param week_day : week day of the substitution date
+        @return : dictionary mapping a teacher id to the list of its
+                  (start time, end time) intervals, dictionary mapping a
+                  teacher id to its number of substitutions on that date
+                  and set of the ids of the other absent teachers
+        '''
+        busy = {}
+        substitutions = {}
+        absent_ids = set(self.search(
+            [('date', '=', self.date),
+             ('id', '!=', self.id),
+             ('state', '=', 'confirm')]).mapped('absent_teacher_ids').ids)
+        for line in self.env['time.table.line'].search_read(
+                [('table_id.timetable_type', '=', 'regular'),
+                 ('table_id.year_id', '=', year.id),
+                 ('week_day', '=', week_day),
+                 ('teacher_id', '!=', False)],
+                ['teacher_id', 'start_time', 'end_time']):
+            busy.setdefault(line['teacher_id'][0], []).append(
+                (line['start_time'], line['end_time']))
+        for line in self.env['time.table.substitution.line'].search_read(
+                [('substitution_id.date', '=', self.date),
+                 ('substitution_id', '!=', self.id),
+                 ('substitution_id.state', '=', 'confirm'),
+                 ('substitute_id', '!=', False)],
+                ['substitute_id', 'start_time', 'end_time']):
+            teacher_id = line['substitute_id'][0]
+            busy.setdefault(teacher_id, []).append(
+                (line['start_time'], line['end_time']))
+            substitutions[teacher_id] = substitutions.get(teacher_id, 0) + 1
+        return busy, substitutions, absent_ids
+
+    def compute_substitutes(self):
+        '''Assign a substitute to every lecture of the absent teachers.
+
+        The lectures of the day, the subject teachers and the teacher
+        loads are read once. The lectures with the fewest free qualified
+        teachers are served first, each one by the free qualified teacher
+        with the fewest substitutions that day, then the fewest lectures
+        that day and then the lowest weekly load.
+        '''
+        line_obj = self.env['time.table.line']
+        for rec in self.filtered(lambda rec: rec.state == 'draft'):
+            year = rec._get_year()
+            week_day = rec.date.strftime('%A').lower()
+            absent_ids = set(rec.absent_teacher_ids.ids)
+            lectures = line_obj.search(
+                [('table_id.timetable_type', '=', 'regular'),
+                 ('table_id.year_id', '=', year.id),
+                 ('week_day', '=', week_day),
+                 ('teacher_id', 'in', list(absent_ids))],
+                order='start_time, id')
+            busy, substitutions, other_absent_ids = rec._get_busy_intervals(
+                year, week_day)
+            lectures_count = {teacher_id: len(intervals)
+                              for teacher_id, intervals in busy.items()}
+            unavailable_ids = absent_ids | other_absent_ids
+            teachers = lectures.mapped('subject_id.teacher_ids').filtered(
+                lambda teacher: teacher.id not in unavailable_ids)
+            weekly = {teacher.id: teacher.weekly_periods
+                      for teacher in teachers}
+
+            def free(teacher_id, lecture):
+                return not any(start < lecture.end_time and
+                               end > lecture.start_time
+                               for start, end in busy.get(teacher_id, []))
+
+            candidates = {
+                lecture: [teacher.id for teacher in
+                          lecture.subject_id.teacher_ids
+                          if teacher.id in weekly]
+                for lecture in lectures}
+            ordered = sorted(lectures, key=lambda lecture: (
+                len([teacher_id for teacher_id in candidates[lecture]
+                     if free(teacher_id, lecture)]),
+                lecture.start_time, lecture.id))
+            vals_list = []
+            for lecture in ordered:
+                available = [teacher_id for teacher_id in candidates[lecture]
+                             if free(teacher_id, lecture)]
+                substitute_id = available and min(
+                    available, key=lambda teacher_id: (
+                        substitutions.get(teacher_id, 0),
+                        lectures_count.get(teacher_id, 0),
+                        weekly[teacher_id], teacher_id))
+                if substitute_id:
+                    busy.setdefault(substitute_id, []).append(
+                        (lecture.start_time, lecture.end_time))
+                    substitutions[substitute_id] = substitutions.get(
+                        substitute_id, 0) + 1
+                vals_list.append({
+                    'substitution_id': rec.id,
+                    'timetable_line_id': lecture.id,
+                    'table_id': lecture.table_id.id,
+                    'subject_id': lecture.subject_id.id,
+                    'teacher_id': lecture.teacher_id.id,
+                    'week_day': lecture.week_day,
+                    'start_time': lecture.start_time,
+                    'end_time': lecture.end_time,
+                    'class_room_id': lecture.class_room_id.id,
+                    'substitute_id': substitute_id or False})
+            rec.line_ids.unlink()
+            self.env['time.table.substitution.line'].create(vals_list)
+        return True
+
+    def substitution_confirm(self):
+        '''Method to confirm the substitutions'''
+        self.write({'state': 'confirm'})
+
+    def substitution_draft(self):
+        '''Method to set the substitutions back to draft'''
+        self.write({'state': 'draft'})
+
+
+class TimeTableSubstitutionLine(models.Model):
+    """Defining the substitute of an absent teacher for a lecture.
+
+    The lecture data is copied on the line so that the substitution
+    history survives the regeneration of the timetables.
+    """
+
+    _description = 'Teacher Substitution Line'
+    _name = 'time.table.substitution.line'
+    _order = 'start_time, id'
+
+    substitution_id = fields.Many2one('time.table.substitution',
+                                      'Substitution', required=True,
+                                      ondelete='cascade')
+    timetable_line_id = fields.Many2one('time.table.line', 'Lecture',
+                                        ondelete='set null')
+    table_id = fields.Many2one('time.table', 'TimeTable', readonly=True)
+    subject_id = fields.Many2one('subject.subject', 'Subject', readonly=True)
+    teacher_id = fields.Many2one('school.teacher', 'Absent Teacher',
+                                 readonly=True)
+    week_day = fields.Selection([('monday', 'Monday'),
+                                 ('tuesday', 'Tuesday'),
+                                 ('wednesday', 'Wednesday'),
+                                 ('thursday', 'Thursday'),
+                                 ('friday', 'Friday'),
+                                 ('saturday', 'Saturday'),
+                                 ('sunday', 'Sunday')], "Week day",
+                                readonly=True)
+    start_time = fields.Float('Start Time', readonly=True)
+    end_time = fields.Float('End Time', readonly=True)
+    class_room_id = fields.Many2one('class.room', 'Room Number',
+                                    readonly=True)
+    substitute_id = fields.Many2one('school.teacher', 'Substitute')
 
 
 class SubjectSubject(models.Model):
     _inherit = "subject.subject"
 
+    weekly_periods = fields.Integer('Periods per Week', default=0,
+                                    help="Number of lectures of the subject "
+                                    "scheduled every week by the timetable "
+                                    "generator")
+
     @api.model
     def _search(self, args, offset=0, limit=None, order=None, count=False,
                 access_rights_uid=None):
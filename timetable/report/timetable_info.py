@@ -2,50 +2,70 @@
 
 from odoo import models, api
 
+WEEK_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+             'saturday', 'sunday']
+
 
 class ReportTimetableInfo(models.AbstractModel):
     _name = 'report.timetable.timetable'
     _description = "Timetable details"
 
+    def _get_timetables(self, timetables):
+        '''Return the slot by week day grid of the timetables, pivoted by
+        a single query: one row per timetable and lecture time with one
+        column per week day holding the subjects and teachers of the slot
+        @param timetables : recordset of time.table
+        @return : dictionary mapping a timetable id to the list of its rows
+        '''
+        if not timetables:
+            return {}
+        self.env['time.table.line'].flush(['table_id', 'subject_id',
+                                           'teacher_id', 'week_day',
+                                           'start_time', 'end_time'])
+        columns = ', '.join(
+            """string_agg(cell, E'\\n' ORDER BY cell)
+               FILTER (WHERE week_day = '%s') AS %s""" % (day, day)
+            for day in WEEK_DAYS)
+        self._cr.execute('''
+            SELECT table_id, start_time, end_time, %s
+            FROM (SELECT t.table_id, t.start_time, t.end_time, t.week_day,
+                         CASE WHEN s.name = 'Recess' OR hr.name IS NULL
+                              THEN s.name
+                              ELSE s.name || E'\\n(' || hr.name || ')'
+                         END AS cell
+                  FROM time_table_line t
+                  JOIN subject_subject s ON s.id = t.subject_id
+                  LEFT JOIN school_teacher st ON st.id = t.teacher_id
+                  LEFT JOIN hr_employee hr ON hr.id = st.employee_id
+                  WHERE t.table_id IN %%s) lecture
+            GROUP BY table_id, start_time, end_time
+            ORDER BY table_id, start_time, end_time''' % columns,
+                         (tuple(timetables.ids),))
+        res = {}
+        for row in self._cr.dictfetchall():
+            res.setdefault(row.pop('table_id'), []).append(row)
+        return res
+
     def _get_timetable(self, timetable_id):
-        timetable_detail = []
-        self._cr.execute('''select t.start_time,t.end_time,s.name,week_day,
-                        st.employee_id, hr.name as
-                        teacher from time_table_line t,
-                        subject_subject s, resource_resource r, school_teacher
-                        st, hr_employee
-                        hr where t.subject_id= s.id and t.teacher_id=st.id and
-                        st.employee_id= hr.id
-                        and  t.table_id = %s
-                        group by start_time,end_time,s.name,week_day,
-                        st.employee_id,hr.name
-                        order by start_time''', tuple([timetable_id.id]))
-        res = self._cr.dictfetchall()
-        self._cr.execute('''select start_time,end_time from time_table_line
-                        where table_id=%s group by start_time,end_time
-                        order by start_time''', tuple([timetable_id.id]))
-        time_data = self._cr.dictfetchall()
-        for time_detail in time_data:
-            for data in res:
-                if ((time_detail['start_time'] == data['start_time']) and
-                        (time_detail['end_time'] == data['end_time'])):
-                    if (data['name'] == 'Recess'):
-                        time_detail[data['week_day']] = data['name']
-                    else:
-                        td = data['name'] + '\n(' + data['teacher'] + ')'
-                        time_detail[data['week_day']] = td
-            timetable_detail.append(time_detail)
-        return timetable_detail
+        return self._get_timetables(timetable_id).get(timetable_id.id, [])
 
     @api.model
     def _get_report_values(self, docids, data=None):
         timetable_report = self.env['ir.actions.report']._get_report_from_name(
             'timetable.timetable')
         docs = self.env['time.table'].browse(docids)
+        # Read the headers of all the timetables together and build all
+        # the grids with one query.
+        docs.mapped('standard_id.standard_id')
+        docs.mapped('standard_id.division_id')
+        docs.mapped('standard_id.medium_id')
+        docs.mapped('year_id')
+        timetables = self._get_timetables(docs)
         return {
             'doc_ids': docids,
             'docs': docs,
             'doc_model': timetable_report.model,
             'data': data,
-            'get_timetable': self._get_timetable
+            'get_timetable': lambda timetable: timetables.get(timetable.id,
+                                                              [])
         }
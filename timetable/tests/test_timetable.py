@@ -1,5 +1,7 @@
 # See LICENSE file for full copyright and licensing details.
 
+from datetime import timedelta
+
 from odoo.tests import common
 from odoo.exceptions import ValidationError, UserError
 
@@ -37,3 +39,174 @@ class TestTimetable(common.TransactionCase):
     def test_timetable(self):
         self.assertIn(self.subject_id, self.teacher_id.subject_id)
 
+    def test_slot_conflicts(self):
+        self.assertFalse(self.time_table_line._get_slot_conflicts('teacher'))
+        time_table = self.time_table_obj.create({
+            'name': 'Slot Timetable',
+            'standard_id': self.env.ref('school.demo_school_standard_1').id,
+            'year_id': self.year_id.id,
+            'timetable_type': 'regular'})
+        with self.assertRaises(ValidationError):
+            self.time_table_line_obj.create({
+                'week_day': 'monday',
+                'teacher_id': self.teacher_id.id,
+                'subject_id': self.subject_id.id,
+                'start_time': 17.5,
+                'end_time': 18.5,
+                'table_id': time_table.id})
+        # The same slot is free again in another academic year.
+        next_table = self.time_table_obj.create({
+            'name': 'Next Year Timetable',
+            'standard_id': self.stander_id.id,
+            'year_id': self.env.ref('school.demo_academic_year_2').id,
+            'timetable_type': 'regular'})
+        line = self.time_table_line_obj.create({
+            'week_day': 'monday',
+            'teacher_id': self.teacher_id.id,
+            'subject_id': self.subject_id.id,
+            'start_time': 17.0,
+            'end_time': 18.0,
+            'table_id': next_table.id,
+            'class_room_id': self.room_id.id})
+        for kind in ('teacher', 'room', 'class'):
+            self.assertFalse(line._get_slot_conflicts(kind))
+
+    def test_generate_timetables(self):
+        standard = self.env.ref('school.demo_school_standard_1')
+        standard.subject_ids.write({'weekly_periods': 0})
+        self.subject_id.weekly_periods = 2
+        periods = self.env['time.table.period'].create([
+            {'name': 'Period %s' % start,
+             'week_day': week_day,
+             'start_time': start,
+             'end_time': start + 1}
+            for week_day in ('monday', 'tuesday') for start in (16.0, 17.0)])
+        generator = self.env['time.table.generate'].create({
+            'year_id': self.year_id.id,
+            'standard_ids': [(6, 0, standard.ids)],
+            'period_ids': [(6, 0, periods.ids)]})
+        generator.generate_timetables()
+        lines = self.time_table_line_obj.search([
+            ('table_id.standard_id', '=', standard.id),
+            ('table_id.year_id', '=', self.year_id.id),
+            ('subject_id', '=', self.subject_id.id)])
+        self.assertEqual(len(lines), 2)
+        # The lectures are spread over the week and never clash.
+        self.assertEqual(set(lines.mapped('week_day')),
+                         {'monday', 'tuesday'})
+        for kind in ('teacher', 'room', 'class'):
+            self.assertFalse(lines._get_slot_conflicts(kind))
+        # Locked lectures are kept when generating again.
+        lines[0].locked = True
+        generator.generate_timetables()
+        self.assertTrue(lines[0].exists())
+        self.assertEqual(self.time_table_line_obj.search_count([
+            ('table_id', '=', lines[0].table_id.id),
+            ('subject_id', '=', self.subject_id.id)]), 2)
+
+    def test_timetable_report(self):
+        grids = self.env['report.timetable.timetable']._get_timetables(
+            self.time_table | self.table_id)
+        rows = grids[self.time_table.id]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['start_time'], rows[0]['end_time']),
+                         (17.0, 18.0))
+        self.assertEqual(rows[0]['monday'], '%s\n(%s)' % (
+            self.subject_id.name, self.teacher_id.employee_id.name))
+        self.assertFalse(rows[0]['tuesday'])
+
+    def test_teacher_load(self):
+        teacher_obj = self.env['school.teacher']
+        free = teacher_obj.get_free_teachers('monday', 17.5, 18.5,
+                                             year_id=self.year_id.id)
+        self.assertNotIn(self.teacher_id, free)
+        free = teacher_obj.get_free_teachers('monday', 18.0, 19.0,
+                                             subject_id=self.subject_id.id,
+                                             year_id=self.year_id.id)
+        self.assertIn(self.teacher_id, free)
+        self.assertIn(self.subject_id, free.mapped('subject_id'))
+        self.env['academic.year'].search([('current', '=', True)]).write(
+            {'current': False})
+        self.year_id.current = True
+        lines = self.time_table_line_obj.search([
+            ('teacher_id', '=', self.teacher_id.id),
+            ('table_id.timetable_type', '=', 'regular'),
+            ('table_id.year_id', '=', self.year_id.id)])
+        self.assertEqual(self.teacher_id.weekly_periods, len(lines))
+        self.assertAlmostEqual(self.teacher_id.weekly_hours, sum(
+            line.end_time - line.start_time for line in lines))
+
+    def test_substitution(self):
+        substitute = self.env.ref('school.demo_school_teacher_2')
+        self.subject_id.teacher_ids = self.teacher_id | substitute
+        monday = self.year_id.date_start
+        monday += timedelta(days=(7 - monday.weekday()) % 7)
+        substitution = self.env['time.table.substitution'].create({
+            'date': monday,
+            'absent_teacher_ids': [(6, 0, self.teacher_id.ids)]})
+        substitution.compute_substitutes()
+        line = substitution.line_ids.filtered(
+            lambda rec: rec.timetable_line_id == self.time_table_line)
+        self.assertEqual(len(line), 1)
+        self.assertEqual(line.substitute_id, substitute)
+        # A confirmed substitute is busy for the other substitutions.
+        substitution.substitution_confirm()
+        other = self.env['time.table.substitution'].create({
+            'date': monday,
+            'absent_teacher_ids': [(6, 0, self.teacher_id.ids)]})
+        other.compute_substitutes()
+        other_line = other.line_ids.filtered(
+            lambda rec: rec.timetable_line_id == self.time_table_line)
+        self.assertEqual(len(other_line), 1)
+        self.assertFalse(other_line.substitute_id)
+        # Deleting the lecture keeps the confirmed substitution.
+        self.time_table_line.unlink()
+        self.assertTrue(line.exists())
+        self.assertFalse(line.timetable_line_id)
+        self.assertEqual(line.teacher_id, self.teacher_id)
+        self.assertEqual(line.substitute_id, substitute)
+
+    def test_substitution_other_absent_teacher(self):
+        # A teacher absent in another confirmed substitution is not picked.
+        substitute = self.env.ref('school.demo_school_teacher_2')
+        self.subject_id.teacher_ids = self.teacher_id | substitute
+        monday = self.year_id.date_start
+        monday += timedelta(days=(7 - monday.weekday()) % 7)
+        absence = self.env['time.table.substitution'].create({
+            'date': monday,
+            'absent_teacher_ids': [(6, 0, substitute.ids)]})
+        absence.substitution_confirm()
+        substitution = self.env['time.table.substitution'].create({
+            'date': monday,
+            'absent_teacher_ids': [(6, 0, self.teacher_id.ids)]})
+        substitution.compute_substitutes()
+        line = substitution.line_ids.filtered(
+            lambda rec: rec.timetable_line_id == self.time_table_line)
+        self.assertEqual(len(line), 1)
+        self.assertFalse(line.substitute_id)
+
+    def test_generate_timetables_new_year(self):
+        # The lectures of the previous year do not book the new year.
+        standard = self.env.ref('school.demo_school_standard_1')
+        standard.subject_ids.write({'weekly_periods': 0})
+        self.subject_id.weekly_periods = 1
+        self.subject_id.teacher_ids = self.teacher_id
+        period = self.env['time.table.period'].create({
+            'name': 'Evening',
+            'week_day': 'monday',
+            'start_time': 17.0,
+            'end_time': 18.0})
+        year = self.env.ref('school.demo_academic_year_2')
+        generator = self.env['time.table.generate'].create({
+            'year_id': year.id,
+            'standard_ids': [(6, 0, standard.ids)],
+            'period_ids': [(6, 0, period.ids)],
+            'room_ids': [(6, 0, self.room_id.ids)]})
+        generator.generate_timetables()
+        line = self.time_table_line_obj.search([
+            ('table_id.standard_id', '=', standard.id),
+            ('table_id.year_id', '=', year.id),
+            ('subject_id', '=', self.subject_id.id)])
+        self.assertEqual(len(line), 1)
+        self.assertEqual(line.teacher_id, self.teacher_id)
+        self.assertEqual(line.start_time, 17.0)
@@ -0,0 +1,289 @@
+# See LICENSE file for full copyright and licensing details.
+
+import random
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+WEEK_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+             'saturday', 'sunday']
+
+# Number of unit orderings tried before keeping the best timetables.
+MAX_ATTEMPTS = 5
+
+
+class TimeTableGenerate(models.TransientModel):
+    _name = 'time.table.generate'
+    _description = 'Generate Timetables'
+
+    @api.model
+    def _default_period_ids(self):
+        return self.env['time.table.period'].search([])
+
+    year_id = fields.Many2one('academic.year', 'Year', required=True,
+                              help="Select academic year")
+    standard_ids = fields.Many2many('school.standard',
+                                    string='Academic Classes', required=True,
+                                    help="Classes whose timetables are "
+                                    "generated")
+    period_ids = fields.Many2many('time.table.period', string='Periods',
+                                  default=_default_period_ids,
+                                  help="Period grid of the week")
+    room_ids = fields.Many2many('class.room', string='Spare Rooms',
+                                help="Rooms used by the classes without a "
+                                "room of their own")
+    generation_report = fields.Text('Generation Report', readonly=True)
+
+    def _get_slots(self):
+        '''Return the period grid sorted by week day and start time
+        @return : list of (week day, start time, end time) slots and for
+                  every slot the indexes of the slots overlapping it
+        '''
+        slots = sorted({(period.week_day, period.start_time, period.end_time)
+                        for period in self.period_ids},
+                       key=lambda slot: (WEEK_DAYS.index(slot[0]), slot[1],
+                                         slot[2]))
+        overlaps = [[index for index, (day, start, end) in enumerate(slots)
+                     if day == slot[0] and start < slot[2] and
+                     end > slot[1]]
+                    for slot in slots]
+        return slots, overlaps
+
+    def _get_timetables(self):
+        '''Return the regular timetable of the year of every class,
+        creating the missing ones
+        @return : dictionary mapping a school standard id to its timetable
+        '''
+        timetable_obj = self.env['time.table']
+        tables = {}
+        for table in timetable_obj.search(
+                [('timetable_type', '=', 'regular'),
+                 ('year_id', '=', self.year_id.id),
+                 ('standard_id', 'in', self.standard_ids.ids)], order='id'):
+            tables.setdefault(table.standard_id.id, table)
+        vals_list = [{'name': '%s - %s' % (standard.name, self.year_id.name),
+                      'standard_id': standard.id,
+                      'year_id': self.year_id.id,
+                      'timetable_type': 'regular',
+                      'class_room_id': standard.class_room_id.id}
+                     for standard in self.standard_ids
+                     if standard.id not in tables]
+        for table in timetable_obj.create(vals_list):
+            tables[table.standard_id.id] = table
+        return tables
+
+    def _get_bookings(self, slots, table_ids):
+        '''Return what the generated lectures have to work around: the
+        locked lectures of the generated timetables and every lecture of
+        the other regular timetables of the year.
+        @param slots : period grid returned by _get_slots
+        @param table_ids : ids of the generated timetables
+        @return : list of the booked (kind, id) resources of every slot,
+                  dictionary of the lectures of every teacher, dictionary
+                  mapping a (timetable id, subject id) key to its teacher
+                  and dictionary mapping the same key to the number of its
+                  locked lectures
+        '''
+        busy = [set() for slot in slots]
+        day_slots = {}
+        for index, slot in enumerate(slots):
+            day_slots.setdefault(slot[0], []).append(index)
+        load = {}
+        teachers = {}
+        locked = {}
+        for line in self.env['time.table.line'].search_read(
+                [('table_id.timetable_type', '=', 'regular'),
+                 ('table_id.year_id', '=', self.year_id.id),
+                 '|', ('table_id', 'not in', table_ids),
+                 ('locked', '=', True)],
+                ['table_id', 'subject_id', 'teacher_id', 'class_room_id',
+                 'week_day', 'start_time', 'end_time']):
+            table_id = line['table_id'][0]
+            keys = [('class', table_id)]
+            teacher_id = line['teacher_id'] and line['teacher_id'][0]
+            if teacher_id:
+                keys.append(('teacher', teacher_id))
+                load[teacher_id] = load.get(teacher_id, 0) + 1
+            if line['class_room_id']:
+                keys.append(('room', line['class_room_id'][0]))
+            for index in day_slots.get(line['week_day'], []):
+                if (slots[index][1] < line['end_time'] and
+                        slots[index][2] > line['start_time']):
+                    busy[index].update(keys)
+            if table_id in table_ids and line['subject_id']:
+                key = (table_id, line['subject_id'][0])
+                locked[key] = locked.get(key, 0) + 1
+                if teacher_id:
+                    teachers.setdefault(key, teacher_id)
+        return busy, load, teachers, locked
+
+    def _get_units(self, tables, locked):
+        '''Return the lectures to place: one unit per class and subject
+        with the number of its weekly periods not covered by locked
+        lectures, its qualified teachers and the room of the class.
+        @param tables : timetables returned by _get_timetables
+        @param locked : locked lectures returned by _get_bookings
+        @return : list of dictionaries
+        '''
+        units = []
+        for standard in self.standard_ids:
+            table = tables[standard.id]
+            for subject in standard.subject_ids:
+                count = (subject.weekly_periods -
+                         locked.get((table.id, subject.id), 0))
+                if count > 0:
+                    units.append({
+                        'table_id': table.id,
+                        'subject_id': subject.id,
+                        'teacher_ids': subject.teacher_ids.ids,
+                        'room_id': (standard.class_room_id.id or
+                                    table.class_room_id.id),
+                        'count': count})
+        return units
+
+    def _place_units(self, units, slots, overlaps, busy, load, teachers):
+        '''Place the lectures of the units one after the other.
+
+        Every lecture takes the slot where its class is free and has the
+        fewest lectures of the subject and then of the day, with the
+        teacher already teaching the subject to the class or else the
+        least loaded free qualified teacher, and the room of the class or
+        else a free spare room.
+        @param units : units returned by _get_units, in placing order
+        @param busy, load, teachers : bookings returned by _get_bookings,
+                                      updated in place
+        @return : list of (unit, slot index, teacher id, room id)
+                  placements and list of (unit, number of lectures not
+                  placed) failures
+        '''
+        room_ids = self.room_ids.ids
+        day_count = {}
+        subject_count = {}
+        placements = []
+        failures = []
+        for unit in units:
+            table_id = unit['table_id']
+            key = (table_id, unit['subject_id'])
+            missing = 0
+            for dummy in range(unit['count']):
+                candidates = sorted(
+                    range(len(slots)),
+                    key=lambda index: (
+                        subject_count.get(key + (slots[index][0],), 0),
+                        day_count.get((table_id, slots[index][0]), 0),
+                        index))
+                placement = None
+                for index in candidates:
+                    if ('class', table_id) in busy[index]:
+                        continue
+                    free = [teacher_id for teacher_id in unit['teacher_ids']
+                            if ('teacher', teacher_id) not in busy[index]]
+                    if not free:
+                        continue
+                    teacher_id = teachers.get(key)
+                    if teacher_id not in free:
+                        teacher_id = min(free, key=lambda teacher: (
+                            load.get(teacher, 0), teacher))
+                    rooms = unit['room_id'] and [unit['room_id']] or room_ids
+                    room_id = next((room for room in rooms
+                                    if ('room', room) not in busy[index]),
+                                   False)
+                    if rooms and not room_id:
+                        continue
+                    placement = (index, teacher_id, room_id)
+                    break
+                if not placement:
+                    missing += 1
+                    continue
+                index, teacher_id, room_id = placement
+                keys = [('class', table_id), ('teacher', teacher_id)]
+                if room_id:
+                    keys.append(('room', room_id))
+                for other in overlaps[index]:
+                    busy[other].update(keys)
+                load[teacher_id] = load.get(teacher_id, 0) + 1
+                teachers.setdefault(key, teacher_id)
+                day = slots[index][0]
+                subject_count[key + (day,)] = subject_count.get(
+                    key + (day,), 0) + 1
+                day_count[(table_id, day)] = day_count.get(
+                    (table_id, day), 0) + 1
+                placements.append((unit, index, teacher_id, room_id))
+            if missing:
+                failures.append((unit, missing))
+        return placements, failures
+
+    def _search_placements(self, units, slots, overlaps, busy, load,
+                           teachers):
+        '''Try several orderings of the units and keep the one placing the
+        most lectures.
+
+        The most constrained units, with the fewest qualified teachers and
+        then the most lectures, are always placed first; the attempts only
+        differ in the order of equally constrained units.
+        @return : best placements and failures of _place_units
+        '''
+        best = None
+        for attempt in range(MAX_ATTEMPTS):
+            ordered = list(units)
+            if attempt:
+                random.Random(attempt).shuffle(ordered)
+            ordered.sort(key=lambda unit: (len(unit['teacher_ids']),
+                                           -unit['count']))
+            placements, failures = self._place_units(
+                ordered, slots, overlaps, [set(keys) for keys in busy],
+                dict(load), dict(teachers))
+            missing = sum(count for unit, count in failures)
+            if best is None or missing < best[0]:
+                best = (missing, placements, failures)
+            if not missing:
+                break
+        return best[1], best[2]
+
+    def _format_report(self, tables, placements, failures):
+        '''Return the generation report as a readable text'''
+        lines = [_('%s lecture(s) generated in %s timetable(s).') % (
+            len(placements), len(tables))]
+        table_obj = self.env['time.table']
+        subject_obj = self.env['subject.subject']
+        for unit, count in failures:
+            lines.append(_('%s - %s: %s lecture(s) could not be placed.') % (
+                table_obj.browse(unit['table_id']).name,
+                subject_obj.browse(unit['subject_id']).name, count))
+        return '\n'.join(lines)
+
+    def generate_timetables(self):
+        '''Generate the regular timetables of the classes.
+
+        The unlocked lectures of the timetables are replaced by clash-free
+        lectures, locked lectures and the timetables of the other classes
+        being kept as they are.
+        '''
+        self.ensure_one()
+        if not self.period_ids:
+            raise UserError(_('Please define the periods of the week!'))
+        tables = self._get_timetables()
+        table_ids = [table.id for table in tables.values()]
+        slots, overlaps = self._get_slots()
+        busy, load, teachers, locked = self._get_bookings(slots, table_ids)
+        units = self._get_units(tables, locked)
+        placements, failures = self._search_placements(
+            units, slots, overlaps, busy, load, teachers)
+        line_obj = self.env['time.table.line']
+        line_obj.search([('table_id', 'in', table_ids),
+                         ('locked', '=', False)]).unlink()
+        line_obj.create([{'table_id': unit['table_id'],
+                          'subject_id': unit['subject_id'],
+                          'teacher_id': teacher_id,
+                          'class_room_id': room_id,
+                          'week_day': slots[index][0],
+                          'start_time': slots[index][1],
+                          'end_time': slots[index][2]}
+                         for unit, index, teacher_id, room_id in placements])
+        self.generation_report = self._format_report(tables, placements,
+                                                     failures)
+        return {'type': 'ir.actions.act_window',
+                'res_model': self._name,
+                'res_id': self.id,
+                'view_mode': 'form',
+                'target': 'new'}